@@ -1,21 +1,243 @@
 import os
 import json
 import re
+import time
+import hashlib
+import threading
+import gzip
+import zlib
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
-from flask import Flask, render_template, send_from_directory, jsonify, request
+import cv2
+import numpy as np
+from flask import Flask, render_template, send_from_directory, jsonify, request, Response, g, abort
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import safe_join
+
+import metrics
+import search_index
+import catalog_store
+import compact_format
+import catalog_views
+import phash_index
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines - no cross-process locking
+    fcntl = None
 
 app = Flask(__name__)
 
 IMAGE_FOLDER = 'images'
 THUMB_FOLDER = 'thumbnails'
 FOLDER_MAP_FILE = 'folder_map.json'
+THUMB_MANIFEST_FILE = os.path.join(THUMB_FOLDER, 'manifest.json')
+# Per-series sprite sheets and their coordinate map, written by sprite_generator.py
+SPRITE_FOLDER = os.path.join(THUMB_FOLDER, 'sprites')
+SPRITE_MAP_FILE = os.path.join(SPRITE_FOLDER, 'sprites.json')
+# Perceptual hashes of every image, written by phash_index.py
+PHASH_FILE = os.path.join(THUMB_FOLDER, 'phash.npz')
+# Render missing thumbnails on first request (same size as MAX_SIZE in thumbnailsGenerater.py)
+THUMB_ON_DEMAND = os.environ.get('THUMB_ON_DEMAND', '1') != '0'
+THUMB_MAX_SIZE = 400
+THUMB_JPEG_QUALITY = 85
+# Responsive variants '<thumbnail>@<size>.<format>' (same ladder as VARIANT_SIZES in
+# thumbnailsGenerater.py), picked with /thumbnails/<path>?w=<size> and the Accept header
+THUMB_SIZES = (160, 320, 640, 1280)
+THUMB_VARIANT_FORMATS = ('avif', 'webp')
+THUMB_VARIANT_QUALITY = {'.webp': (cv2.IMWRITE_WEBP_QUALITY, 80), '.avif': (getattr(cv2, 'IMWRITE_AVIF_QUALITY', None), 60)}
+# Fingerprinted media URLs '/v/<hash>/images/...' and '/v/<hash>/thumbnails/...', with
+# the hash taken from the thumbnail manifest, are cached by browsers and CDNs for a year
+FINGERPRINT_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', 8))
+# Folders changed more recently than this are rescanned again on the next refresh
+RACY_WINDOW_NS = 2 * 10**9
+
+# Catalog cache: how often (seconds) a request may re-check the tree for changes,
+# and a file whose mtime forces every worker to rebuild (see `flask reload-catalog`)
+CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL', 5))
+CATALOG_GENERATION_FILE = '.catalog_generation'
+# Prebuilt catalog written by catalog_builder.py; when present it replaces live scanning
+CATALOG_FILE = 'catalog.json'
+CATALOG_FORMAT = 1
+# Optional SQLite store written by catalog_builder.py --store. When CATALOG_STORE
+# names one, the API and share links are answered from it
+CATALOG_STORE = os.environ.get('CATALOG_STORE')
+MISSING_SLUGS_LIMIT = 10000
+MISSING_SLUG_RECHECK = 1.0
+
+# API responses are revalidated with their ETag on every use
+API_CACHE_CONTROL = 'public, no-cache'
+# Compression of cached payloads: (gzip level, brotli quality) when built on a
+# request, and the slower, smaller levels used by warm_up() before workers start
+PAYLOAD_COMPRESSION = (6, 5)
+WARM_PAYLOAD_COMPRESSION = (9, 11)
+# /api/coins: every filter and page combination is a miss, so its pages are compressed quicker still
+FILTERED_PAYLOAD_COMPRESSION = (4, 4)
+# Bytes of serialized payloads (all encodings) kept per catalog version; the least
+# recently used are dropped past it. And the /api/coins page size cap
+PAYLOAD_CACHE_BYTES = int(os.environ.get('PAYLOAD_CACHE_BYTES', 64 * 1024 * 1024))
+MAX_PER_PAGE = 1000
+# /api/data?stream=1 is sent in chunks of about this many bytes, as the tree is walked
+STREAM_CHUNK_SIZE = 16 * 1024
+# Coin fields the grid needs, sent by /api/summary (the rest come from /api/coin/<slug>)
+SUMMARY_FIELDS = ('category', 'series', 'series_img', 'year', 'name', 'subtype', 'has_image', 'thumb_src',
+                  'thumb_available', 'thumb_width', 'thumb_height', 'thumb_url', 'thumb_srcset', 'sprite')
+# Default number of /api/search results
+SEARCH_LIMIT = 50
+# /api/similar: default number of matches and the largest photo accepted
+SIMILAR_LIMIT = 10
+PHOTO_MAX_BYTES = 10 * 1024 * 1024
+# Largest request body: the photo plus its multipart headers. Werkzeug also enforces
+# it on chunked uploads, which have no Content-Length to check up front
+app.config['MAX_CONTENT_LENGTH'] = PHOTO_MAX_BYTES + 64 * 1024
 
 # Load translations
 folder_map = {}
-if os.path.exists(FOLDER_MAP_FILE):
-    with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
-        folder_map = json.load(f)
+
+def load_folder_map():
+    global folder_map
+    if os.path.exists(FOLDER_MAP_FILE):
+        with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
+            folder_map = json.load(f)
+
+load_folder_map()
+
+# Thumbnail manifest written by thumbnailsGenerater.py (None when it doesn't exist,
+# in which case thumbnail availability is probed on disk)
+thumb_manifest = None
+thumb_manifest_mtime = 0
+
+def load_thumb_manifest():
+    global thumb_manifest, thumb_manifest_mtime
+    mtime = file_mtime(THUMB_MANIFEST_FILE)
+    if mtime == thumb_manifest_mtime:
+        return
+    data = get_json_data(THUMB_MANIFEST_FILE) if mtime else None
+    thumb_manifest = {rel: entry for rel, entry in data.items() if 'thumb' in entry} if data else None
+    thumb_manifest_mtime = mtime
+
+# Sprite map written by sprite_generator.py (None when it doesn't exist)
+sprite_map = None
+sprite_map_mtime = 0
+
+def load_sprite_map():
+    global sprite_map, sprite_map_mtime
+    mtime = file_mtime(SPRITE_MAP_FILE)
+    if mtime == sprite_map_mtime:
+        return
+    sprite_map = get_json_data(SPRITE_MAP_FILE) if mtime else None
+    sprite_map_mtime = mtime
+
+def sprite_fields(img_path):
+    """Catalog field locating a thumbnail in its series sprite sheet: [sheet, x, y]"""
+    position = sprite_map['thumbs'].get(img_path) if sprite_map else None
+    return {'sprite': position} if position else {}
+
+def sprite_sheets(coins):
+    """The sprite sheets referenced by coins, keyed by name, with their URL and geometry"""
+    sheets = {}
+    for coin in coins:
+        if 'sprite' in coin and sprite_map:
+            name = coin['sprite'][0]
+            sheet = sprite_map['sheets'][name]
+            sheets[name] = {'url': f"/sprites/{sheet['file']}", 'width': sheet['width'],
+                            'height': sheet['height'], 'cell': sprite_map['cell']}
+    return sheets
+
+def probes_thumbnails():
+    """True when thumbnail availability has to be checked on disk"""
+    return thumb_manifest is None and not THUMB_ON_DEMAND
+
+def image_fingerprint(img_path):
+    """Content hash of an original image, as recorded in the manifest (None if unknown)"""
+    entry = thumb_manifest.get(img_path) if thumb_manifest else None
+    return entry['sha256'][:FINGERPRINT_LENGTH] if entry and entry.get('sha256') else None
+
+def thumb_fingerprint(img_path):
+    """Content hash of an image's thumbnail, as recorded in the manifest (None if unknown)"""
+    entry = thumb_manifest.get(img_path) if thumb_manifest else None
+    return entry['thumb']['sha256'][:FINGERPRINT_LENGTH] if entry and entry['thumb'].get('sha256') else None
+
+@functools.lru_cache(maxsize=4096)
+def quote_folder(path):
+    return quote(path)
+
+def media_url(folder, img_path, fingerprint=None):
+    """URL of images/<img_path> or thumbnails/<img_path>, fingerprinted when the hash is known"""
+    # Quoting is per character, so the coin folder (Hebrew, shared by all its
+    # images) is quoted once and only the file name on every call
+    i = img_path.rfind('/') + 1
+    url = '/' + quote_folder(f"{folder}/{img_path[:i]}") + quote(img_path[i:])
+    return f"/v/{fingerprint}{url}" if fingerprint else url
+
+def image_fields(img_paths):
+    """Catalog fields with the fingerprinted URLs of a coin's images (none if no hash is known)"""
+    fingerprints = [image_fingerprint(p) for p in img_paths]
+    if not any(fingerprints):
+        return {}
+    return {'image_urls': [media_url('images', p, fp) for p, fp in zip(img_paths, fingerprints)]}
+
+def thumb_srcset(img_path, widths, fingerprint=None):
+    """srcset attribute value for (size, pixel width) pairs of an image's variants"""
+    url = media_url('thumbnails', img_path, fingerprint)
+    return ', '.join(f"{url}?w={size} {width}w" for size, width in widths)
+
+def thumb_fields(img_path):
+    """Catalog fields describing the thumbnail of an image: availability plus its size when known"""
+    entry = thumb_manifest.get(img_path) if thumb_manifest else None
+    if entry is not None:
+        thumb = entry['thumb']
+        fingerprint = thumb_fingerprint(img_path)
+        fields = {'thumb_available': True, 'thumb_width': thumb['width'], 'thumb_height': thumb['height']}
+        if fingerprint:
+            fields['thumb_url'] = media_url('thumbnails', img_path, fingerprint)
+        if entry.get('variants'):
+            widths = [(v['size'], v['width']) for v in entry['variants']]
+            fields['thumb_srcset'] = thumb_srcset(img_path, widths, fingerprint)
+        elif THUMB_ON_DEMAND:
+            fields['thumb_srcset'] = thumb_srcset(img_path, [(size, size) for size in THUMB_SIZES])
+        return fields
+    if THUMB_ON_DEMAND:
+        # /thumbnails renders whatever is missing; real widths are unknown until rendered
+        return {'thumb_available': True, 'thumb_srcset': thumb_srcset(img_path, [(size, size) for size in THUMB_SIZES])}
+    if thumb_manifest is None:
+        start = metrics.clock()
+        available = os.path.exists(os.path.join(THUMB_FOLDER, img_path))
+        metrics.add_time('coins_scan_phase_seconds_total', start, phase='thumb_probe')
+        return {'thumb_available': available}
+    return {'thumb_available': False}
+
+# Media fields of each coin's images, keyed by its image paths. They only depend on
+# the thumbnail manifest and sprite map, so a rescan reuses them until those change
+# instead of recomputing fingerprints, URLs and srcsets for every image.
+_media_cache = {'inputs': None, 'fields': {}}
+
+def media_fields(img_paths):
+    """image_fields(), thumb_fields() and sprite_fields() of a coin's images (its first one is the thumbnail)"""
+    global _media_cache
+    inputs = (thumb_manifest_mtime, sprite_map_mtime, THUMB_ON_DEMAND)
+    cache = _media_cache
+    if cache['inputs'] != inputs:
+        cache = _media_cache = {'inputs': inputs, 'fields': {}}
+    key = tuple(img_paths)
+    fields = cache['fields'].get(key)
+    if fields is None:
+        primary = img_paths[0]
+        fields = {**image_fields(img_paths), **thumb_fields(primary), **sprite_fields(primary)}
+        # Thumbnails probed on disk can appear at any time
+        if not probes_thumbnails():
+            cache['fields'][key] = fields
+    return fields
 
 def get_trans_obj(hebrew_text):
     return {
@@ -24,7 +246,14 @@ def get_trans_obj(hebrew_text):
     }
 
 def is_image(filename):
-    return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
+    # Same as os.path.splitext(filename)[1] (leading dots don't start an extension), without its overhead
+    dot = filename.rfind('.')
+    return dot > 0 and filename[dot:].lower() in ALLOWED_EXTENSIONS and filename[:dot].strip('.') != ''
+
+def extract_year(text):
+    """Gregorian year of a folder name like 'תשלד (1974)', same as extractYear() in the frontend"""
+    match = re.search(r'\d{4}', str(text or ''))
+    return int(match.group(0)) if match else None
 
 def get_json_data(path):
     if os.path.exists(path):
@@ -35,65 +264,199 @@ def get_json_data(path):
             return {}
     return {}
     
+def list_dir(path):
+    """(name, is_dir) for every entry of a folder, in os.listdir order.
+
+    The type comes from the DirEntry cache, so no extra stat per entry.
+    """
+    start = metrics.clock()
+    with os.scandir(path) as entries:
+        result = [(entry.name, entry.is_dir()) for entry in entries]
+    metrics.add_time('coins_scan_phase_seconds_total', start, phase='listdir')
+    return result
+
+def read_details(path):
+    """details.json of a coin or subtype folder, timed as its own scan phase"""
+    start = metrics.clock()
+    data = get_json_data(path)
+    metrics.add_time('coins_scan_phase_seconds_total', start, phase='details')
+    return data
+
+# --- INCREMENTAL SCAN STATE ---
+# Directory listings and per-coin results of the previous scan, keyed by path
+# and stored with the stat signature they were built from. A rescan only lists
+# folders whose mtime changed and only re-runs process_coin_item() for coin
+# folders whose signature changed.
+_scan_state = {'dirs': {}, 'coins': {}, 'inputs': None}
+
+def reset_scan_state():
+    global _scan_state
+    _scan_state = {'dirs': {}, 'coins': {}, 'inputs': None}
+
+def stat_signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def is_settled(signature):
+    """False for paths modified within RACY_WINDOW_NS; their mtime may not catch a write in the same tick."""
+    return signature is None or time.time_ns() - signature[0] > RACY_WINDOW_NS
+
+def cached_list_dir(path, previous, state, signature=None):
+    if signature is None:
+        signature = stat_signature(path)
+    cached = previous['dirs'].get(path)
+    hit = cached is not None and cached[0] == signature
+    metrics.cache('scan_dirs', hit)
+    entries = cached[1] if hit else list_dir(path)
+    if is_settled(signature):
+        state['dirs'][path] = (signature, entries)
+    return entries
+
+def coin_signature(coin_path, rel_path, entries, folder_signature):
+    """Stat signature of a coin folder: the folder, its details.json and subtype folders.
+
+    When thumbnails are probed on disk the matching thumbnail folders are included too.
+    """
+    probe_thumbs = probes_thumbnails()
+    parts = [
+        folder_signature,
+        stat_signature(os.path.join(coin_path, 'details.json')),
+    ]
+    if probe_thumbs:
+        parts.append(stat_signature(os.path.join(THUMB_FOLDER, rel_path)))
+    for name, is_dir in entries:
+        if is_dir:
+            parts.append(stat_signature(os.path.join(coin_path, name)))
+            parts.append(stat_signature(os.path.join(coin_path, name, 'details.json')))
+            if probe_thumbs:
+                parts.append(stat_signature(os.path.join(THUMB_FOLDER, rel_path, name)))
+    return tuple(parts)
+
 def scan_collection():
-    collection = []
-    
+    global _scan_state
+    start = metrics.clock()
     if not os.path.exists(IMAGE_FOLDER):
         os.makedirs(IMAGE_FOLDER)
 
+    load_thumb_manifest()
+    load_sprite_map()
+    inputs = (dict(folder_map), thumb_manifest_mtime, sprite_map_mtime)
+    previous = _scan_state
+    if previous['inputs'] != inputs:
+        # Translations, thumbnail manifest or sprite map changed - every cached coin may be stale
+        previous = {'dirs': previous['dirs'], 'coins': {}, 'inputs': None}
+    state = {'dirs': {}, 'coins': {}, 'inputs': inputs}
+
+    # Year folders are scanned in a thread pool; results are kept in walk order
+    year_jobs = walk_years(lambda path: cached_list_dir(path, previous, state))
+    collection = []
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        for year_items in pool.map(lambda job: scan_year(previous, state, *job), year_jobs):
+            collection.extend(year_items)
+
+    _scan_state = state
+    metrics.observe_since('coins_scan_duration_seconds', start)
+    return collection
+
+def walk_years(list_folder):
+    """Yield (category, series, year, year_path, cat_obj, series_obj, series_img) of every year folder, lazily"""
     # 1. LOOP CATEGORIES (Circulation vs Sets)
-    for category_name in os.listdir(IMAGE_FOLDER):
-        category_path = os.path.join(IMAGE_FOLDER, category_name)
-        if not os.path.isdir(category_path) or category_name in ['thumbnails', 'static']: 
+    for category_name, is_dir in list_folder(IMAGE_FOLDER):
+        if not is_dir or category_name in ['thumbnails', 'static']: 
             continue
 
+        category_path = os.path.join(IMAGE_FOLDER, category_name)
         cat_obj = get_trans_obj(category_name)
 
         # 2. LOOP SERIES (Standard for EVERY category now)
-        for series_name in os.listdir(category_path):
-            series_path = os.path.join(category_path, series_name)
-            if not os.path.isdir(series_path): continue
+        for series_name, is_dir in list_folder(category_path):
+            if not is_dir: continue
 
+            series_path = os.path.join(category_path, series_name)
             series_obj = get_trans_obj(series_name)
+            series_entries = list_folder(series_path)
             series_img = None
             
             # Find series hero image
-            for f in os.listdir(series_path):
+            for f, _ in series_entries:
                 if is_image(f):
                     series_img = os.path.join(category_name, series_name, f).replace("\\", "/")
                     break
 
             # 3. LOOP YEARS
-            for year in os.listdir(series_path):
-                year_path = os.path.join(series_path, year)
-                if not os.path.isdir(year_path): continue
+            for year, is_dir in series_entries:
+                if not is_dir: continue
+                yield (category_name, series_name, year, os.path.join(series_path, year), cat_obj, series_obj, series_img)
+
+def iter_collection():
+    """The coins of scan_collection(), in the same order, one coin folder at a time.
 
-                # 4. LOOP COINS
-                for coin_name in os.listdir(year_path):
-                    coin_path = os.path.join(year_path, coin_name)
-                    if not os.path.isdir(coin_path): continue
+    Nothing is cached or kept: only the current folder's listing and coins are in memory.
+    """
+    if not os.path.exists(IMAGE_FOLDER):
+        return
+    load_thumb_manifest()
+    load_sprite_map()
+    for category_name, series_name, year, year_path, cat_obj, series_obj, series_img in walk_years(list_dir):
+        # 4. LOOP COINS
+        for coin_name, is_dir in list_dir(year_path):
+            if not is_dir: continue
+            coin_items = []
+            coin_path = os.path.join(year_path, coin_name)
+            process_coin_item(coin_items, category_name, series_name, year, coin_name,
+                              coin_path, list_dir(coin_path), cat_obj, series_obj, series_img)
+            yield from coin_items
 
-                    # Process Coin
-                    process_coin_item(collection, category_name, series_name, year, coin_name, coin_path, cat_obj, series_obj, series_img)
+def scan_year(previous, state, category_name, series_name, year, year_path, cat_obj, series_obj, series_img):
+    year_items = []
 
-    return collection
+    # 4. LOOP COINS
+    for coin_name, is_dir in cached_list_dir(year_path, previous, state):
+        if not is_dir: continue
+
+        coin_path = os.path.join(year_path, coin_name)
+        rel_path = os.path.join(category_name, series_name, year, coin_name)
+        # The folder is stat'ed once, for its listing and its signature
+        folder_signature = stat_signature(coin_path)
+        entries = cached_list_dir(coin_path, previous, state, folder_signature)
+        start = metrics.clock()
+        signature = (coin_signature(coin_path, rel_path, entries, folder_signature), series_img)
+        metrics.add_time('coins_scan_phase_seconds_total', start, phase='stat')
 
-def process_coin_item(collection, category_name, series_dir_name, year, coin_name, coin_path, cat_obj, series_obj, series_img):
-    """Helper to process a single coin folder"""
-    folder_contents = os.listdir(coin_path)
-    subdirs = [d for d in folder_contents if os.path.isdir(os.path.join(coin_path, d))]
-    images_in_root = [f for f in folder_contents if is_image(f)]
+        # Reuse the previous result if nothing in the coin folder changed
+        cached = previous['coins'].get(coin_path)
+        hit = cached is not None and cached[0] == signature
+        metrics.cache('scan_coins', hit)
+        if hit:
+            coin_items = cached[1]
+        else:
+            coin_items = []
+            process_coin_item(coin_items, category_name, series_name, year, coin_name, coin_path, entries,
+                              cat_obj, series_obj, series_img)
+        if all(is_settled(part) for part in signature[0]):
+            state['coins'][coin_path] = (signature, coin_items)
+        year_items.extend(coin_items)
+
+    return year_items
+
+def process_coin_item(collection, category_name, series_dir_name, year, coin_name, coin_path, folder_contents,
+                      cat_obj, series_obj, series_img):
+    """Helper to process a single coin folder, given its list_dir() entries"""
+    subdirs = [d for d, is_dir in folder_contents if is_dir]
+    images_in_root = [f for f, _ in folder_contents if is_image(f)]
     images_in_root.sort()
 
-    coin_stats = get_json_data(os.path.join(coin_path, 'details.json'))
+    has_details = any(f == 'details.json' for f, _ in folder_contents)
+    coin_stats = read_details(os.path.join(coin_path, 'details.json')) if has_details else {}
     name_obj = get_trans_obj(coin_name)
 
-    # Helper to build path
+    # Helper to build path (the coin folder's prefix is joined once)
+    coin_prefix = f"{category_name}/{series_dir_name}/{year}/{coin_name}/"
     def build_img_path(img_file, sub_folder=None):
-        parts = [category_name, series_dir_name, year, coin_name]
-        if sub_folder: parts.append(sub_folder)
-        parts.append(img_file)
-        return os.path.join(*parts).replace("\\", "/")
+        return f"{coin_prefix}{sub_folder}/{img_file}" if sub_folder else coin_prefix + img_file
 
     # --- PART A: Root Images ---
     if images_in_root:
@@ -102,33 +465,33 @@ def process_coin_item(collection, category_name, series_dir_name, year, coin_nam
 
         img_paths = [build_img_path(img) for img in images_in_root]
         primary_thumb = img_paths[0]
-        use_thumb = os.path.exists(os.path.join(THUMB_FOLDER, primary_thumb))
 
         collection.append({
             'category': cat_obj, 'series': series_obj, 'series_img': series_img, 'year': year,
             'name': name_obj, 'subtype': subtype_obj, 
-            'images': img_paths, 'thumb_src': primary_thumb, 'thumb_available': use_thumb,
+            'images': img_paths, 'thumb_src': primary_thumb, **media_fields(img_paths),
             'has_image': True, 'stats': coin_stats
         })
     
     # --- PART B: Subtypes ---
     for subtype in subdirs:
         subtype_path = os.path.join(coin_path, subtype)
-        subtype_imgs = [f for f in os.listdir(subtype_path) if is_image(f)]
+        subtype_contents = list_dir(subtype_path)
+        subtype_imgs = [f for f, _ in subtype_contents if is_image(f)]
         subtype_imgs.sort()
-        subtype_stats = get_json_data(os.path.join(subtype_path, 'details.json'))
+        has_details = any(f == 'details.json' for f, _ in subtype_contents)
+        subtype_stats = read_details(os.path.join(subtype_path, 'details.json')) if has_details else {}
         final_stats = {**coin_stats, **subtype_stats}
         subtype_obj = get_trans_obj(subtype)
 
         if subtype_imgs:
             img_paths = [build_img_path(img, subtype) for img in subtype_imgs]
             primary_thumb = img_paths[0]
-            use_thumb = os.path.exists(os.path.join(THUMB_FOLDER, primary_thumb))
 
             collection.append({
                 'category': cat_obj, 'series': series_obj, 'series_img': series_img, 'year': year,
                 'name': name_obj, 'subtype': subtype_obj,
-                'images': img_paths, 'thumb_src': primary_thumb, 'thumb_available': use_thumb,
+                'images': img_paths, 'thumb_src': primary_thumb, **media_fields(img_paths),
                 'has_image': True, 'stats': final_stats
             })
         else:
@@ -146,8 +509,416 @@ def process_coin_item(collection, category_name, series_dir_name, year, coin_nam
             'has_image': False, 'stats': coin_stats
         })
 
-@app.route('/')
-def index():
+# --- CATALOG CACHE ---
+# The scan result is kept in memory per process and only rebuilt when the
+# tree signature changes (or on an explicit reload).
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+def tree_signature():
+    """Cheap fingerprint of everything the catalog is built from.
+
+    Uses directory mtimes (entries added, removed or renamed) plus the mtimes of
+    the JSON files, so no image is opened and no JSON is parsed. With a prebuilt
+    CATALOG_FILE only that file is looked at. The thumbnail tree is only walked
+    when thumbnail availability is probed on disk.
+    """
+    h = hashlib.sha1()
+    for path in (CATALOG_GENERATION_FILE, FOLDER_MAP_FILE, CATALOG_FILE, THUMB_MANIFEST_FILE, SPRITE_MAP_FILE):
+        h.update(f"{path}:{file_mtime(path)}\n".encode('utf-8'))
+    if os.path.exists(CATALOG_FILE):
+        return h.hexdigest()
+
+    folders = [IMAGE_FOLDER]
+    if not os.path.exists(THUMB_MANIFEST_FILE) and not THUMB_ON_DEMAND:
+        folders.append(THUMB_FOLDER)
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            h.update(f"{root}:{file_mtime(root)}\n".encode('utf-8'))
+            for f in sorted(files):
+                if f.endswith('.json'):
+                    h.update(f"{f}:{file_mtime(os.path.join(root, f))}\n".encode('utf-8'))
+    return h.hexdigest()
+
+def compile_catalog():
+    """Scan the tree into a plain, JSON-serializable catalog.
+
+    This is what catalog_builder.py writes to CATALOG_FILE, and what the app
+    builds itself when that file is missing.
+    """
+    load_folder_map()
+    coins = scan_collection()
+
+    slugs = {}
+    for i, coin in enumerate(coins):
+        slugs.setdefault(coin_slug(coin), i)  # first match wins, like the old linear search
+
+    data = {
+        'format': CATALOG_FORMAT,
+        'coins': coins,
+        'config': get_json_data(os.path.join(IMAGE_FOLDER, 'order.json')),
+        'folder_map': folder_map,
+        'slugs': slugs,
+        'facets': build_facets(coins),
+        'thumbnails': sorted(coin['thumb_src'] for coin in coins if coin.get('thumb_available')),
+        'sprites': sprite_sheets(coins),
+    }
+    data['version'] = hashlib.sha256(
+        json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    return data
+
+def load_catalog_file(path=CATALOG_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != CATALOG_FORMAT:
+        raise ValueError(f"{path} has format {data.get('format')}, expected {CATALOG_FORMAT}")
+    # JSON object keys are strings, years are ints
+    data['facets']['year'] = {int(year): indexes for year, indexes in data['facets']['year'].items()}
+    return data
+
+def build_catalog(signature):
+    global folder_map
+    if os.path.exists(CATALOG_FILE):
+        data = load_catalog_file()
+        folder_map = data['folder_map']
+        app.logger.info("Loaded prebuilt catalog %s (version %s)", CATALOG_FILE, data['version'])
+    else:
+        data = compile_catalog()
+
+    coins = data['coins']
+    years = data['facets']['year']
+    return {
+        'version': data['version'],
+        'signature': signature,
+        'checked_at': time.monotonic(),
+        'coins': coins,
+        'config': data['config'],
+        'sprites': data.get('sprites', {}),
+        'slugs': {slug: coins[i] for slug, i in data['slugs'].items()},
+        'missing_slugs': set(),
+        'facets': data['facets'],
+        'names': facet_names(coins),
+        'years': (min(years), max(years)) if years else None,
+        'payloads': PayloadCache(),
+        'payload_locks': {},
+        'coin_payloads': {},
+    }
+
+def build_facets(coins):
+    """Per-facet lists of coin indexes (in catalog order), keyed by Hebrew and English names."""
+    facets = {'category': {}, 'series': {}, 'year': {}}
+    for i, coin in enumerate(coins):
+        for facet in ('category', 'series'):
+            for name in set(coin[facet].values()):
+                facets[facet].setdefault(name, []).append(i)
+        year = extract_year(coin['year'])
+        if year is not None:
+            facets['year'].setdefault(year, []).append(i)
+    return facets
+
+def facet_names(coins):
+    """{'category': {name: Hebrew name}, 'series': {...}} of every Hebrew and English name"""
+    return {facet: {name: coin[facet]['he'] for coin in coins for name in coin[facet].values()}
+            for facet in ('category', 'series')}
+
+def get_stats_tokens(catalog):
+    """Per coin, the set of normalized words of its details.json, built on first use"""
+    tokens = catalog.get('stats_tokens')
+    if tokens is None:
+        tokens = catalog['stats_tokens'] = [
+            set(catalog_store.stats_text(coin, folder_map).split()) for coin in catalog['coins']]
+    return tokens
+
+def filter_coins(catalog, category=None, series=None, year_from=None, year_to=None, stats=None):
+    """Indexes of the coins matching every given filter, in catalog order."""
+    facets = catalog['facets']
+    selected = []
+    if category:
+        selected.append(facets['category'].get(category, []))
+    if series:
+        selected.append(facets['series'].get(series, []))
+    if year_from is not None or year_to is not None:
+        low = year_from if year_from is not None else float('-inf')
+        high = year_to if year_to is not None else float('inf')
+        in_range = []
+        for year, indexes in facets['year'].items():
+            if low <= year <= high:
+                in_range.extend(indexes)
+        selected.append(sorted(in_range))
+    if stats is not None:
+        words = set(search_index.tokenize(stats))
+        selected.append([i for i, tokens in enumerate(get_stats_tokens(catalog)) if words and words <= tokens])
+
+    if not selected:
+        return list(range(len(catalog['coins'])))
+
+    selected.sort(key=len)
+    others = [set(indexes) for indexes in selected[1:]]
+    return [i for i in selected[0] if all(i in other for other in others)]
+
+def canonical_filters(catalog, category=None, series=None, year_from=None, year_to=None, stats=None):
+    """The /api/coins filters in one spelling, or None when no coin can match them.
+
+    Names resolve to their Hebrew form, year bounds are clamped to the catalog's
+    range and stats becomes its sorted, normalized words, so every way of asking
+    for the same coins gives the same tuple.
+    """
+    names = catalog['names']
+    if category:
+        category = names['category'].get(category)
+        if category is None:
+            return None
+    if series:
+        series = names['series'].get(series)
+        if series is None:
+            return None
+    if year_from is not None or year_to is not None:
+        if catalog['years'] is None:
+            return None
+        low, high = catalog['years']
+        year_from = low if year_from is None else max(year_from, low)
+        year_to = high if year_to is None else min(year_to, high)
+        if year_from > year_to:
+            return None
+    if stats is not None:
+        words = sorted(set(search_index.tokenize(stats)))
+        if not words:
+            return None
+        stats = ' '.join(words)
+    return category or None, series or None, year_from, year_to, stats
+
+def get_catalog(max_age=None):
+    """Return the cached catalog, rebuilding it only if the tree has changed.
+
+    The tree is re-checked when the last check is older than `max_age` seconds
+    (CATALOG_CHECK_INTERVAL by default).
+    """
+    global _catalog
+    if max_age is None:
+        max_age = CATALOG_CHECK_INTERVAL
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - catalog['checked_at'] < max_age:
+        return catalog
+
+    with _catalog_lock:
+        catalog = _catalog
+        if catalog is not None and time.monotonic() - catalog['checked_at'] < max_age:
+            return catalog
+
+        signature = tree_signature()
+        metrics.cache('catalog', catalog is not None and catalog['signature'] == signature)
+        if catalog is not None and catalog['signature'] == signature:
+            catalog['checked_at'] = time.monotonic()
+            return catalog
+
+        new_catalog = build_catalog(signature)
+        if catalog is not None and catalog['version'] == new_catalog['version']:
+            # Same content (e.g. only mtimes changed) - keep the serialized payloads
+            new_catalog['payloads'] = catalog['payloads']
+            new_catalog['payload_locks'] = catalog['payload_locks']
+            new_catalog['coin_payloads'] = catalog['coin_payloads']
+        _catalog = new_catalog
+        return _catalog
+
+def reload_catalog():
+    """Explicitly rebuild the catalog of this process from a full rescan."""
+    global _catalog
+    with _catalog_lock:
+        reset_scan_state()
+        _catalog = build_catalog(tree_signature())
+        return _catalog
+
+# --- SQLITE STORE ---
+_store = {'version': None}
+
+def get_store():
+    """The CATALOG_STORE database (this thread's connection, version and payload cache), or None"""
+    global _store
+    if not CATALOG_STORE or not os.path.exists(CATALOG_STORE):
+        return None
+    conn = catalog_store.connect(CATALOG_STORE)
+    version = catalog_store.get_meta(conn, 'version')
+    store = _store
+    if store['version'] != version:
+        store = _store = {
+            'version': version,
+            'count': int(catalog_store.get_meta(conn, 'count')),
+            'config': json.loads(catalog_store.get_meta(conn, 'config')),
+            'sprites': json.loads(catalog_store.get_meta(conn, 'sprites')),
+            'names': catalog_store.facet_names(conn),
+            'years': catalog_store.year_range(conn),
+            'payloads': PayloadCache(),
+            'payload_locks': {},
+            'coin_payloads': {},
+        }
+    return {**store, 'conn': conn}
+
+def warm_up():
+    """Build the catalog, the /api/data payload and the lookup indexes before the first request.
+
+    gunicorn.conf.py runs this in the master process before it forks, so every
+    worker starts with them in memory, shared copy-on-write, along with the
+    gallery's views of every category. With a CATALOG_STORE only its /api/data
+    and /api/summary payloads are built. Returns the catalog version and size.
+    """
+    best = WARM_PAYLOAD_COMPRESSION
+    store = get_store()
+    if store is not None:
+        get_payload(store, 'data', lambda: data_response(store), best)
+        get_payload(store, 'summary-compact', lambda: compact_summary_response(store), best)
+        return store['version'], store['count']
+
+    catalog = get_catalog()
+    get_payload(catalog, 'data', lambda: data_response(catalog), best)
+    get_payload(catalog, 'summary-compact', lambda: compact_summary_response(catalog), best)
+    for category in {coin['category']['he'] for coin in catalog['coins']}:
+        for mode in catalog_views.MODES:
+            get_payload(catalog, ('views', category, mode), lambda: views_response(catalog, category, mode), best)
+    get_search_index(catalog)
+    get_image_coins(catalog)
+    load_phash()
+    return catalog['version'], len(catalog['coins'])
+
+# --- SERIALIZED PAYLOADS ---
+# API bodies are serialized and compressed once per catalog version and kept
+# in catalog['payloads'], so a request only picks an encoding. Concurrent
+# requests for a payload that is being built wait for it instead of building
+# it again.
+_payload_locks_lock = threading.Lock()
+
+class PayloadCache:
+    """Payloads by key, holding at most `max_bytes` of bodies; the least recently used go first"""
+
+    def __init__(self, max_bytes=PAYLOAD_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+            return payload
+
+    def put(self, key, payload):
+        size = payload_size(payload)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= payload_size(previous)
+            self.entries[key] = payload
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= payload_size(evicted)
+
+def payload_size(payload):
+    return sum(len(body) for body in payload['encodings'].values())
+
+def dumps(data):
+    """Compact JSON exactly as the API serializes it"""
+    return app.json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+def build_payload(data, compression=PAYLOAD_COMPRESSION):
+    """Serialized and compressed body of `data` (already serialized if it's bytes)"""
+    body = data if isinstance(data, bytes) else dumps(data).encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    gzip_level, brotli_quality = compression
+    encodings = {'identity': body, 'gzip': gzip.compress(body, compresslevel=gzip_level)}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(body, quality=brotli_quality)
+    return {'etag': etag, 'encodings': encodings}
+
+def get_payload(catalog, key, build, compression=PAYLOAD_COMPRESSION):
+    """Cached payload for `key`, building it with `build()` on first use (once, even under concurrency)."""
+    payload = catalog['payloads'].get(key)
+    metrics.cache('payload', payload is not None)
+    if payload is not None:
+        return payload
+
+    with _payload_locks_lock:
+        lock = catalog['payload_locks'].setdefault(key, threading.Lock())
+    with lock:
+        payload = catalog['payloads'].get(key)
+        if payload is None:
+            payload = build_payload(build(), compression)
+            catalog['payloads'].put(key, payload)
+            catalog['payload_locks'].pop(key, None)
+    return payload
+
+def send_payload(payload):
+    encodings = payload['encodings']
+    encoding = request.accept_encodings.best_match(
+        [e for e in ('br', 'gzip') if e in encodings], default='identity')
+    # Strong ETags must differ per encoded representation
+    tags = {e: payload['etag'] if e == 'identity' else f"{payload['etag']}-{e}" for e in encodings}
+
+    headers = {
+        'ETag': f'"{tags[encoding]}"',
+        'Cache-Control': API_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding',
+    }
+    if any(request.if_none_match.contains(tag) for tag in tags.values()):
+        return Response(status=304, headers=headers)
+
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(encodings[encoding], mimetype='application/json', headers=headers)
+
+@app.cli.command('reload-catalog')
+def reload_catalog_command():
+    """Tell every running worker to rebuild its catalog on the next request."""
+    with open(CATALOG_GENERATION_FILE, 'w', encoding='utf-8') as f:
+        f.write(str(time.time()))
+    print("Catalog generation bumped, workers will reload within "
+          f"{CATALOG_CHECK_INTERVAL:g}s.")
+
+def coin_slug(coin):
+    """Share-link slug of a coin, identical to getCoinSlug() in the frontend"""
+    name_he = coin.get('name', {}).get('he', '')
+    series_he = coin.get('series', {}).get('he', '')
+    subtype_he = coin.get('subtype', {}).get('he', '') if coin.get('subtype') else ""
+    year = coin.get('year', '')
+
+    slug = f"{year}_{name_he}_{series_he}"
+    if subtype_he and subtype_he != 'ללא תיוג':
+        slug += f"_{subtype_he}"
+
+    # Clean up slug - using regex to handle multiple spaces just like JS replace(/\s+/g, '-')
+    slug = re.sub(r'\s+', '-', slug)
+    return slug.replace("(", "").replace(")", "")
+
+def find_coin_by_slug(slug):
+    """O(1) lookup of a shared coin; unknown slugs are remembered per catalog version."""
+    store = get_store()
+    if store is not None:
+        return catalog_store.find_by_slug(store['conn'], slug)
+
+    catalog = get_catalog()
+    coin = catalog['slugs'].get(slug)
+    metrics.cache('slugs', coin is not None)
+    if coin is not None or slug in catalog['missing_slugs']:
+        return coin
+
+    # Unknown slug - the coin may have been added since the last check
+    catalog = get_catalog(max_age=MISSING_SLUG_RECHECK)
+    coin = catalog['slugs'].get(slug)
+    if coin is None and len(catalog['missing_slugs']) < MISSING_SLUGS_LIMIT:
+        catalog['missing_slugs'].add(slug)
+    return coin
+
+def render_index(template_name):
     # 1. Grab the 'coin' parameter from the URL
     shared_coin_slug = request.args.get('coin')
     
@@ -156,100 +927,38 @@ def index():
     og_desc = "קטלוג דיגיטלי מקיף של מטבעות ישראל"
     og_image = request.url_root + "static/favicon.svg" 
     
-    if shared_coin_slug:
-        # 3. Scan collection
-        all_coins = scan_collection()
-        
-        for coin in all_coins:
-            name_he = coin.get('name', {}).get('he', '')
-            series_he = coin.get('series', {}).get('he', '')
-            subtype_he = coin.get('subtype', {}).get('he', '') if coin.get('subtype') else ""
-            year = coin.get('year', '')
-            
-            # Replicate frontend slug logic exactly
-            slug = f"{year}_{name_he}_{series_he}"
-            if subtype_he and subtype_he != 'ללא תיוג':
-                slug += f"_{subtype_he}"
-            
-            # Clean up slug - using regex to handle multiple spaces just like JS replace(/\s+/g, '-')
-            slug = re.sub(r'\s+', '-', slug)
-            slug = slug.replace("(", "").replace(")", "")
-            
-            if slug == shared_coin_slug:
-                og_title = f"{name_he} - {year} | {series_he}"
-                
-                if coin.get('has_image') and coin.get('images'):
-                    img_path = coin.get('thumb_src') if coin.get('thumb_available') else coin['images'][0]
-                    folder = "thumbnails" if coin.get('thumb_available') else "images"
-                    
-                    # URL ENCODING IS CRITICAL HERE FOR WHATSAPP/FACEBOOK
-                    full_relative_path = f"{folder}/{img_path}"
-                    safe_url_path = quote(full_relative_path)
-                    
-                    og_image = request.url_root + safe_url_path
-                    
-                break # Stop searching once found
+    # 3. Look the coin up in the slug index
+    coin = find_coin_by_slug(shared_coin_slug) if shared_coin_slug else None
+    if coin:
+        name_he = coin.get('name', {}).get('he', '')
+        series_he = coin.get('series', {}).get('he', '')
+        og_title = f"{name_he} - {coin.get('year', '')} | {series_he}"
+
+        if coin.get('has_image') and coin.get('images'):
+            # URL ENCODING IS CRITICAL HERE FOR WHATSAPP/FACEBOOK (media_url quotes the path)
+            if coin.get('thumb_available'):
+                safe_url_path = coin.get('thumb_url') or media_url('thumbnails', coin['thumb_src'])
+            else:
+                safe_url_path = (coin.get('image_urls') or [media_url('images', coin['images'][0])])[0]
+
+            og_image = request.url_root.rstrip('/') + safe_url_path
 
     # 4. Render the template with the dynamic tags
     return render_template(
-        'index.html', 
+        template_name, 
         og_title=og_title, 
         og_desc=og_desc, 
         og_image=og_image
     )
 
+@app.route('/')
+def index():
+    return render_index('index.html')
+
 #TODO remove
 @app.route('/index2')
 def index2():
-    # 1. Grab the 'coin' parameter from the URL
-    shared_coin_slug = request.args.get('coin')
-    
-    # 2. Default Open Graph Tags (IMPORTANT: change favicon.svg to a png/jpg if you want a default fallback, SVG doesn't work for OG)
-    og_title = "ארכיון המטבעות הישראלי"
-    og_desc = "קטלוג דיגיטלי מקיף של מטבעות ישראל"
-    og_image = request.url_root + "static/favicon.svg" 
-    
-    if shared_coin_slug:
-        # 3. Scan collection
-        all_coins = scan_collection()
-        
-        for coin in all_coins:
-            name_he = coin.get('name', {}).get('he', '')
-            series_he = coin.get('series', {}).get('he', '')
-            subtype_he = coin.get('subtype', {}).get('he', '') if coin.get('subtype') else ""
-            year = coin.get('year', '')
-            
-            # Replicate frontend slug logic exactly
-            slug = f"{year}_{name_he}_{series_he}"
-            if subtype_he and subtype_he != 'ללא תיוג':
-                slug += f"_{subtype_he}"
-            
-            # Clean up slug - using regex to handle multiple spaces just like JS replace(/\s+/g, '-')
-            slug = re.sub(r'\s+', '-', slug)
-            slug = slug.replace("(", "").replace(")", "")
-            
-            if slug == shared_coin_slug:
-                og_title = f"{name_he} - {year} | {series_he}"
-                
-                if coin.get('has_image') and coin.get('images'):
-                    img_path = coin.get('thumb_src') if coin.get('thumb_available') else coin['images'][0]
-                    folder = "thumbnails" if coin.get('thumb_available') else "images"
-                    
-                    # URL ENCODING IS CRITICAL HERE FOR WHATSAPP/FACEBOOK
-                    full_relative_path = f"{folder}/{img_path}"
-                    safe_url_path = quote(full_relative_path)
-                    
-                    og_image = request.url_root + safe_url_path
-                    
-                break # Stop searching once found
-
-    # 4. Render the template with the dynamic tags
-    return render_template(
-        'index2.html', 
-        og_title=og_title, 
-        og_desc=og_desc, 
-        og_image=og_image
-    )
+    return render_index('index2.html')
 
 
 @app.route('/about')
@@ -264,9 +973,307 @@ def accessibility():
 
 @app.route('/api/data')
 def get_data():
-    coins = scan_collection()
-    order_config = get_json_data(os.path.join(IMAGE_FOLDER, 'order.json'))
-    return jsonify({'coins': coins, 'config': order_config})
+    """Every coin. ?format=compact sends them with repeated values in lookup tables
+    (see compact_format.py), ?stream=1 streams them while the tree is read.
+    """
+    store = get_store()
+    if request.args.get('stream') == '1':
+        return stream_data(store)
+    catalog = store if store is not None else get_catalog()
+    if request.args.get('format') == 'compact':
+        return send_payload(get_payload(catalog, 'data-compact', lambda: compact_response(catalog)))
+    return send_payload(get_payload(catalog, 'data', lambda: data_response(catalog)))
+
+def data_chunks(store=None):
+    """/api/data as UTF-8 chunks, produced while the tree (or the store) is read.
+
+    The body is the same as the cached one, but only the coins of the current
+    chunk are held: from the store they are read row by row, otherwise the tree
+    is walked lazily with iter_collection(). A prebuilt CATALOG_FILE is what the
+    app serves instead of the tree, so its loaded coins are streamed as they are.
+    """
+    if store is not None:
+        docs = catalog_store.iter_docs(store['conn'])
+        config, sprites = store['config'], store['sprites']
+    elif os.path.exists(CATALOG_FILE):
+        catalog = get_catalog()
+        docs = (dumps(coin) for coin in catalog['coins'])
+        config, sprites = catalog['config'], catalog['sprites']
+    else:
+        # Names are translated with the folder_map the catalog was last built with
+        sheets = {}
+
+        def serialize(coins):
+            for coin in coins:
+                sheets.update(sprite_sheets([coin]))
+                yield dumps(coin)
+
+        docs = serialize(iter_collection())
+        config = get_json_data(os.path.join(IMAGE_FOLDER, 'order.json'))
+        sprites = sheets
+
+    # Keys in the same (sorted) order as the cached body
+    buffer = ['{"coins":[']
+    size = 0
+    for i, doc in enumerate(docs):
+        buffer.append(doc if i == 0 else ',' + doc)
+        size += len(doc)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    # sprites is complete only once every coin has been seen
+    buffer.append(f'],"config":{dumps(config)},"sprites":{dumps(sprites)}}}')
+    yield ''.join(buffer).encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Gzip a stream chunk by chunk, flushing each so the client can decode it right away"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def stream_data(store=None):
+    """/api/data?stream=1: chunked, uncached, starting before the walk is done"""
+    headers = {'Cache-Control': 'no-store', 'Vary': 'Accept-Encoding'}
+    chunks = data_chunks(store)
+    if request.accept_encodings.best_match(['gzip'], default='identity') == 'gzip':
+        headers['Content-Encoding'] = 'gzip'
+        chunks = gzip_chunks(chunks)
+    return Response(chunks, mimetype='application/json', headers=headers)
+
+@app.route('/api/summary')
+def get_summary():
+    """The grid's view of every coin: names, year, thumbnail and share-link slug.
+
+    Images and stats are left out; the modal loads them from /api/coin/<slug>.
+    ?format=compact works as for /api/data.
+    """
+    store = get_store()
+    catalog = store if store is not None else get_catalog()
+    if request.args.get('format') == 'compact':
+        return send_payload(get_payload(catalog, 'summary-compact', lambda: compact_summary_response(catalog)))
+    return send_payload(get_payload(catalog, 'summary', lambda: summary_response(catalog)))
+
+def coin_summary(coin):
+    summary = {field: coin[field] for field in SUMMARY_FIELDS if field in coin}
+    summary['slug'] = coin_slug(coin)
+    if coin.get('image_urls'):
+        summary['image_url'] = coin['image_urls'][0]
+    alt = (coin.get('stats') or {}).get('alt')
+    if alt:
+        summary['alt'] = alt
+    return summary
+
+def summary_response(catalog):
+    """Body of /api/summary (already serialized when it comes from the store)"""
+    if 'conn' in catalog:
+        return catalog_store.summary_body(catalog['conn'])
+    return {'coins': [coin_summary(coin) for coin in catalog['coins']], 'config': catalog['config'],
+            'sprites': catalog['sprites'], 'version': catalog['version']}
+
+def compact_summary_response(catalog):
+    """Body of /api/summary?format=compact"""
+    if 'conn' in catalog:
+        summaries = [json.loads(doc) for doc in catalog_store.iter_docs(catalog['conn'], 'summary')]
+        data = {'coins': summaries, 'config': catalog['config'], 'sprites': catalog['sprites'],
+                'version': catalog['version']}
+    else:
+        data = summary_response(catalog)
+    return compact_format.compact(data, dumps, media_url)
+
+@app.route('/api/views')
+def get_views():
+    """The gallery's sections for ?category=&mode=year|coin|sets, grouped and ordered.
+
+    Category accepts the Hebrew or English name; the response names it in Hebrew.
+    Sections list coins by their index in /api/summary; both carry the catalog
+    version they belong to.
+    """
+    mode = request.args.get('mode', 'year')
+    if mode not in catalog_views.MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(catalog_views.MODES)}"}), 400
+
+    store = get_store()
+    catalog = store if store is not None else get_catalog()
+    # Both names share one cached view, and unknown categories are never cached
+    category = catalog['names']['category'].get(request.args.get('category', ''))
+    if category is None:
+        return jsonify({'error': 'Unknown category'}), 404
+    return send_payload(get_payload(catalog, ('views', category, mode), lambda: views_response(catalog, category, mode)))
+
+def views_response(catalog, category, mode):
+    """Body of /api/views"""
+    # The store only reads the names and years of the category's coins
+    coins = catalog_store.view_coins(catalog['conn'], category) if 'conn' in catalog else catalog['coins']
+    view = catalog_views.build_view(coins, catalog['config'], category, mode)
+    return {**view, 'version': catalog['version']}
+
+@app.route('/api/coin/<path:slug>')
+def get_coin(slug):
+    """One coin with its images, stats and the translations of its texts, by share-link slug"""
+    coin = find_coin_by_slug(slug)
+    if coin is None:
+        return jsonify({'error': 'Unknown coin'}), 404
+
+    # Cached apart from the other payloads: only known slugs get here, so this
+    # holds at most one entry per coin and never crowds out searches or filters
+    store = get_store()
+    catalog = store if store is not None else get_catalog()
+    payload = catalog['coin_payloads'].get(slug)
+    metrics.cache('payload', payload is not None)
+    if payload is None:
+        payload = build_payload({'coin': coin, 'translations': coin_translations(coin)})
+        catalog['coin_payloads'][slug] = payload
+    return send_payload(payload)
+
+def coin_translations(coin):
+    """English of the coin's names, stat keys and stat values that folder_map.json translates"""
+    texts = [(coin.get(field) or {}).get('he') for field in ('category', 'series', 'name', 'subtype')]
+    for key, value in (coin.get('stats') or {}).items():
+        texts.append(key)
+        texts.extend(search_index.stat_values(value))
+    return {text: folder_map[text] for text in texts if isinstance(text, str) and text in folder_map}
+
+def data_response(catalog):
+    """Body of /api/data (already serialized when it comes from the store)"""
+    if 'conn' in catalog:
+        return catalog_store.data_body(catalog['conn'])
+    return {'coins': catalog['coins'], 'config': catalog['config'], 'sprites': catalog['sprites']}
+
+def compact_response(catalog):
+    """Body of /api/data?format=compact"""
+    data = data_response(catalog)
+    if isinstance(data, bytes):
+        data = json.loads(data)
+    return compact_format.compact(data, dumps, media_url)
+
+@app.route('/api/coins')
+def get_coins():
+    """Filtered view of /api/data: ?category=&series=&year_from=&year_to=&stats=&page=&per_page=
+
+    Category and series accept the Hebrew or English name, stats is matched word by
+    word against details.json keys and values. Without page/per_page all matches
+    are returned.
+    """
+    args = request.args
+    paginate = 'page' in args or 'per_page' in args
+    page = max(args.get('page', 1, type=int), 1)
+    per_page = min(max(args.get('per_page', 100, type=int), 1), MAX_PER_PAGE)
+
+    store = get_store()
+    catalog = store if store is not None else get_catalog()
+    filters = canonical_filters(catalog, args.get('category'), args.get('series'), args.get('year_from', type=int),
+                                args.get('year_to', type=int), args.get('stats'))
+
+    def build():
+        limit = per_page if paginate else None
+        offset = (page - 1) * per_page if paginate else 0
+        if filters is None:
+            total, coins = 0, []
+        elif store is not None:
+            total, coins = catalog_store.query_coins(store['conn'], *filters, limit, offset)
+        else:
+            matches = filter_coins(catalog, *filters)
+            total = len(matches)
+            if paginate:
+                matches = matches[offset:offset + limit]
+            coins = [catalog['coins'][i] for i in matches]
+        data = {
+            'coins': coins,
+            'total': total,
+            'config': catalog['config'],
+            'sprites': catalog['sprites'],
+        }
+        if paginate:
+            data.update({'page': page, 'per_page': per_page, 'pages': -(-total // per_page)})
+        return data
+
+    # Only pages are cached, under their canonical filters: an unpaginated answer can
+    # be the whole catalog, and filters nothing matches are answered at once
+    if filters is None or not paginate:
+        return send_payload(build_payload(build(), FILTERED_PAYLOAD_COMPRESSION))
+    return send_payload(get_payload(catalog, ('coins', *filters, page, per_page), build, FILTERED_PAYLOAD_COMPRESSION))
+
+def get_search_index(catalog):
+    """Inverted index of a catalog, built on first use (once per catalog version)"""
+    index = catalog.get('search_index')
+    if index is None:
+        index = catalog['search_index'] = search_index.build_index(catalog['coins'], folder_map)
+    return index
+
+@app.route('/api/search')
+def search():
+    """Coins matching every word of ?q= (word prefixes too, for type-ahead): ?q=&limit=
+
+    Names, series, subtypes, years and details.json values are searched in Hebrew and
+    English. Results are ranked by how many words matched exactly, then catalog order.
+    """
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', SEARCH_LIMIT, type=int), 1), MAX_PER_PAGE)
+
+    # Every keystroke is a new query: results are sent as they are, not compressed
+    # and cached like the catalog payloads (compression is left to the front proxy)
+    store = get_store()
+    if store is not None:
+        matches = catalog_store.search(store['conn'], query)
+        docs = catalog_store.load_docs(store['conn'], matches[:limit])
+        coins, sprites = [docs[i] for i in matches[:limit]], store['sprites']
+    else:
+        catalog = get_catalog()
+        matches = search_index.search(get_search_index(catalog), query)
+        coins, sprites = [catalog['coins'][i] for i in matches[:limit]], catalog['sprites']
+    return jsonify({'coins': coins, 'total': len(matches), 'sprites': sprites})
+
+# Perceptual-hash index (None when phash_index.py hasn't been run)
+phash = None
+phash_mtime = 0
+
+def load_phash():
+    global phash, phash_mtime
+    mtime = file_mtime(PHASH_FILE)
+    if mtime == phash_mtime:
+        return
+    phash = phash_index.load_index(PHASH_FILE) if mtime else None
+    phash_mtime = mtime
+
+def get_image_coins(catalog):
+    """Image path -> coin of a catalog, built on first use"""
+    image_coins = catalog.get('image_coins')
+    if image_coins is None:
+        image_coins = catalog['image_coins'] = {img: coin for coin in catalog['coins'] for img in coin['images']}
+    return image_coins
+
+@app.route('/api/similar', methods=['POST'])
+def similar():
+    """Coins whose photos look most like an uploaded one: POST a 'photo' file, ?limit=
+
+    Matches are the nearest images by Hamming distance of their perceptual hashes
+    (0 = identical, 64 = unrelated), trying the photo in all four rotations.
+    """
+    try:
+        upload = request.files.get('photo')
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"photo is larger than {PHOTO_MAX_BYTES} bytes"}), 413
+    if upload is None:
+        return jsonify({'error': "missing 'photo' file"}), 400
+    hashes = phash_index.photo_hashes(upload.read())
+    if hashes is None:
+        return jsonify({'error': "photo could not be decoded"}), 400
+
+    load_phash()
+    if phash is None:
+        return jsonify({'error': "photo index is not built"}), 503
+
+    limit = min(max(request.args.get('limit', SIMILAR_LIMIT, type=int), 1), MAX_PER_PAGE)
+    nearest = phash_index.nearest(phash, hashes, limit)
+    store = get_store()
+    if store is not None:
+        image_coins = catalog_store.image_coins(store['conn'], [path for path, _ in nearest])
+    else:
+        image_coins = get_image_coins(get_catalog())
+    return jsonify({'matches': [
+        {'image': path, 'distance': distance, 'coin': image_coins.get(path)} for path, distance in nearest
+    ]})
 
 @app.route('/api/translations')
 def get_translations():
@@ -276,9 +1283,179 @@ def get_translations():
 def serve_image(filename):
     return send_from_directory(IMAGE_FOLDER, filename)
 
+# --- FINGERPRINTED MEDIA ---
+def cache_immutable(response, fingerprint, current):
+    """Let clients cache a fingerprinted response forever, if the fingerprint is still current.
+
+    An outdated fingerprint (a page rendered before the image changed) still gets the
+    file, just with the normal revalidating headers.
+    """
+    if current and fingerprint == current:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@app.route('/sprites/<path:filename>')
+def serve_sprite(filename):
+    if not is_image(filename):
+        abort(404)  # sprites.json is the generator's, the page gets the sheets in /api/data
+    # Sheet names are content hashes, so they never change
+    response = send_from_directory(SPRITE_FOLDER, filename)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@app.route('/v/<fingerprint>/images/<path:filename>')
+def serve_fingerprinted_image(fingerprint, filename):
+    load_thumb_manifest()
+    return cache_immutable(serve_image(filename), fingerprint, image_fingerprint(filename))
+
+@app.route('/v/<fingerprint>/thumbnails/<path:filename>')
+def serve_fingerprinted_thumbnail(fingerprint, filename):
+    load_thumb_manifest()
+    return cache_immutable(serve_thumbnail(filename), fingerprint, thumb_fingerprint(filename))
+
+# --- ON-DEMAND THUMBNAILS ---
+def render_thumbnail(filename, dest_name=None, size=THUMB_MAX_SIZE):
+    """Create the missing thumbnail of images/<filename>. Returns False if it can't be made.
+
+    `dest_name` (default: `filename`) is the path under thumbnails/ to write, and its
+    extension picks the format. The file is written to a temp name and renamed into
+    place, under an exclusive lock so concurrent workers don't render it twice.
+    """
+    source_file = safe_join(IMAGE_FOLDER, filename)
+    dest_file = safe_join(THUMB_FOLDER, dest_name or filename)
+    if source_file is None or dest_file is None or not is_image(filename) or not os.path.isfile(source_file):
+        return False
+
+    lock_file = dest_file + '.lock'
+    tmp_file = f"{dest_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+        lock = open(lock_file, 'a')
+    except OSError as e:
+        app.logger.warning("Could not render thumbnail %s: %s", filename, e)
+        metrics.inc('coins_thumbnails_rendered_total', result='error')
+        return False
+    with lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another worker may have finished it while we waited for the lock
+            if os.path.exists(dest_file):
+                return True
+
+            source_ext = os.path.splitext(filename)[1].lower()
+            ext = os.path.splitext(dest_file)[1].lower()
+            # IMREAD_COLOR applies the EXIF orientation; keep alpha for the other formats
+            flags = cv2.IMREAD_COLOR if source_ext in ('.jpg', '.jpeg') else cv2.IMREAD_UNCHANGED
+            # np.fromfile + imdecode instead of imread, which can't open non-ASCII paths on Windows
+            img = cv2.imdecode(np.fromfile(source_file, dtype=np.uint8), flags)
+            if img is None:
+                return False
+
+            height, width = img.shape[:2]
+            scale = min(size / width, size / height, 1)
+            if scale < 1:
+                dimensions = (max(1, round(width * scale)), max(1, round(height * scale)))
+                img = cv2.resize(img, dimensions, interpolation=cv2.INTER_AREA)
+
+            params = []
+            if ext in ('.jpg', '.jpeg'):
+                params = [cv2.IMWRITE_JPEG_QUALITY, THUMB_JPEG_QUALITY]
+            elif THUMB_VARIANT_QUALITY.get(ext, (None,))[0] is not None:
+                params = list(THUMB_VARIANT_QUALITY[ext])
+            ok, buf = cv2.imencode(ext, img, params)
+            if not ok:
+                return False
+
+            buf.tofile(tmp_file)
+            os.replace(tmp_file, dest_file)
+            metrics.inc('coins_thumbnails_rendered_total', result='ok')
+            return True
+        except (cv2.error, OSError) as e:
+            # Undecodable image, full disk, permissions... - the caller serves the original
+            app.logger.warning("Could not render thumbnail %s: %s", filename, e)
+            metrics.inc('coins_thumbnails_rendered_total', result='error')
+            return False
+        finally:
+            # The temp file only remains if the write failed; waiters still hold the
+            # lock's old inode and will find the thumbnail in place
+            for leftover in (tmp_file, lock_file):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+
+def accepted_variant_formats():
+    """Modern image formats the client explicitly accepts, best first"""
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    return [fmt for fmt in THUMB_VARIANT_FORMATS if f'image/{fmt}' in accepted]
+
+def serve_thumbnail_variant(filename, size):
+    """Best variant of a thumbnail for a requested width, or None to fall back to the plain thumbnail"""
+    sizes = THUMB_SIZES
+    entry = thumb_manifest.get(filename) if thumb_manifest else None
+    if entry and entry.get('variants'):
+        sizes = [v['size'] for v in entry['variants']]  # the generator never upscales
+    size = next((s for s in sizes if s >= size), sizes[-1])
+
+    for fmt in accepted_variant_formats():
+        variant_name = f"{filename}@{size}.{fmt}"
+        variant_file = safe_join(THUMB_FOLDER, variant_name)
+        if variant_file is None:
+            return None
+        if os.path.isfile(variant_file) or (
+                THUMB_ON_DEMAND and cv2.haveImageWriter(variant_file) and render_thumbnail(filename, variant_name, size)):
+            return send_from_directory(THUMB_FOLDER, variant_name, mimetype=f'image/{fmt}')
+    return None
+
 @app.route('/thumbnails/<path:filename>')
 def serve_thumbnail(filename):
+    size = request.args.get('w', type=int)
+    if size:
+        response = serve_thumbnail_variant(filename, size) or serve_plain_thumbnail(filename)
+        response.vary.add('Accept')
+        return response
+    return serve_plain_thumbnail(filename)
+
+def serve_plain_thumbnail(filename):
+    if not is_image(filename):
+        abort(404)  # build artifacts kept next to the thumbnails (manifest.json, phash.npz...)
+    if THUMB_ON_DEMAND:
+        thumb_file = safe_join(THUMB_FOLDER, filename)
+        if thumb_file is not None and not os.path.isfile(thumb_file) and not render_thumbnail(filename):
+            # Format we can't render - fall back to the original
+            return send_from_directory(IMAGE_FOLDER, filename)
     return send_from_directory(THUMB_FOLDER, filename)
 
+# --- METRICS ---
+# Endpoints whose response body is a file, by the folder it comes from
+FILE_ENDPOINTS = {
+    'serve_image': 'images', 'serve_fingerprinted_image': 'images',
+    'serve_thumbnail': 'thumbnails', 'serve_fingerprinted_thumbnail': 'thumbnails',
+    'serve_sprite': 'sprites',
+}
+
+@app.before_request
+def start_request_timer():
+    g.request_start = metrics.clock()
+
+@app.after_request
+def record_request(response):
+    if metrics.ENABLED:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_since('coins_http_request_duration_seconds', g.request_start,
+                              route=route, method=request.method, status=response.status_code)
+        folder = FILE_ENDPOINTS.get(request.endpoint)
+        if folder and response.status_code == 200 and response.content_length:
+            metrics.inc('coins_http_response_bytes_total', response.content_length, folder=folder)
+    return response
+
+@app.route('/metrics')
+def serve_metrics():
+    """Metrics of the worker that answers - see metrics.py for multi-worker setups"""
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == "__main__":
     app.run(debug=True,host="0.0.0.0", port=5000)
@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import argparse
+
+import app
+import catalog_store
+
+# Compiles images/, every details.json, order.json and folder_map.json into
+# app.CATALOG_FILE. The web app loads that file at startup instead of scanning.
+# With --store it writes the same catalog as an indexed SQLite database instead
+# (see catalog_store.py), which the app serves from when CATALOG_STORE points at it.
+
+def write_catalog(data, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def write_store(data, path):
+    slugs = [app.coin_slug(coin) for coin in data['coins']]
+    summaries = [app.coin_summary(coin) for coin in data['coins']]
+    catalog_store.build_store(path, data, slugs, summaries, app.dumps, app.extract_year)
+
+def build(output, check=False, store=None):
+    data = app.compile_catalog()
+
+    if store:
+        write_store(data, store)
+        print(f"✅ Wrote {store}: {len(data['coins'])} coins (version {data['version']})")
+        return 0
+
+    if check:
+        if not os.path.exists(output):
+            print(f"❌ {output} is missing")
+            return 1
+        try:
+            current = app.load_catalog_file(output)
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            print(f"❌ {output} is unreadable: {e}")
+            return 1
+        if current['version'] != data['version']:
+            print(f"❌ {output} is out of date (version {current['version']}, tree is {data['version']})")
+            return 1
+        print(f"✅ {output} is up to date (version {data['version']})")
+        return 0
+
+    write_catalog(data, output)
+    print(f"✅ Wrote {output}: {len(data['coins'])} coins, {len(data['slugs'])} slugs, "
+          f"{len(data['thumbnails'])} thumbnails (version {data['version']})")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the coin tree into a prebuilt catalog file.")
+    parser.add_argument('--output', default=app.CATALOG_FILE, help=f"catalog file to write (default: {app.CATALOG_FILE})")
+    parser.add_argument('--check', action='store_true', help="only verify the catalog file matches the tree (exit 1 on drift)")
+    parser.add_argument('--store', default=None, help="write an indexed SQLite store to this path instead")
+    args = parser.parse_args()
+    sys.exit(build(args.output, args.check, args.store))
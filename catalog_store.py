@@ -0,0 +1,252 @@
+import os
+import json
+import sqlite3
+import threading
+
+import search_index
+
+# Optional SQLite form of the catalog, written by catalog_builder.py --store.
+# Coins are rows indexed by category, series, year and name, with their
+# details.json text and their /api/search text in FTS5 tables; each row also
+# keeps the coin exactly as /api/data and /api/summary serialize it, and an image
+# table maps photos back to their coin, so the API can be answered without
+# building the catalog in memory. The app opens it read-only, one connection per
+# thread.
+
+STORE_FORMAT = 2
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE coins (
+    id INTEGER PRIMARY KEY,  -- position in the catalog
+    slug TEXT NOT NULL,
+    category_he TEXT, category_en TEXT,
+    series_he TEXT, series_en TEXT,
+    year TEXT, year_num INTEGER,
+    name_he TEXT, name_en TEXT,
+    subtype_he TEXT, subtype_en TEXT,
+    doc TEXT NOT NULL,       -- the coin as serialized in /api/data
+    summary TEXT NOT NULL    -- and its /api/summary entry
+);
+CREATE TABLE images (path TEXT PRIMARY KEY, coin INTEGER NOT NULL) WITHOUT ROWID;
+CREATE INDEX coins_slug ON coins (slug);
+CREATE INDEX coins_category_he ON coins (category_he, year_num);
+CREATE INDEX coins_category_en ON coins (category_en, year_num);
+CREATE INDEX coins_series_he ON coins (series_he, year_num);
+CREATE INDEX coins_series_en ON coins (series_en, year_num);
+CREATE INDEX coins_year ON coins (year_num);
+CREATE INDEX coins_name_he ON coins (name_he);
+CREATE INDEX coins_name_en ON coins (name_en);
+-- details.json keys and values (with translations), normalized like /api/search
+CREATE VIRTUAL TABLE stats_fts USING fts5(stats);
+-- Tokens of search_index.coin_texts(), kept whole (decimals included) so FTS5
+-- matches exactly the words and prefixes the in-memory index does
+CREATE VIRTUAL TABLE search_fts USING fts5(text, tokenize = "unicode61 remove_diacritics 0 tokenchars '.'");
+"""
+
+# --- BUILD ---
+def stats_text(coin, folder_map):
+    words = []
+    for key, value in (coin.get('stats') or {}).items():
+        for text in [key, folder_map.get(key, '')] + [
+                t for v in search_index.stat_values(value) for t in (v, folder_map.get(v, ''))]:
+            words.extend(search_index.tokenize(text))
+    return ' '.join(words)
+
+def search_text(coin, folder_map):
+    return ' '.join(token for text in search_index.coin_texts(coin, folder_map) for token in search_index.tokenize(text))
+
+def build_store(path, data, slugs, summaries, dumps, year_of):
+    """Write the catalog `data` (from app.compile_catalog()) to a new SQLite file at `path`.
+
+    `slugs` are the coins' share-link slugs, `summaries` their /api/summary entries,
+    `dumps` the app's JSON serializer and `year_of` its folder-name -> Gregorian
+    year parser. The file is swapped in atomically, so open readers keep their
+    snapshot.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        meta = {
+            'format': str(STORE_FORMAT),
+            'version': data['version'],
+            'count': str(len(data['coins'])),
+            'config': dumps(data['config']),
+            'sprites': dumps(data.get('sprites', {})),
+        }
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+
+        def names(coin, field):
+            obj = coin.get(field) or {}
+            return obj.get('he'), obj.get('en')
+
+        conn.executemany(
+            "INSERT INTO coins VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((i, slug, *names(coin, 'category'), *names(coin, 'series'), coin.get('year'), year_of(coin.get('year')),
+              *names(coin, 'name'), *names(coin, 'subtype'), dumps(coin), dumps(summary))
+             for i, (coin, slug, summary) in enumerate(zip(data['coins'], slugs, summaries))))
+        # A photo filed under two coins maps to the last one, like app.get_image_coins()
+        conn.executemany(
+            "INSERT OR REPLACE INTO images VALUES (?, ?)",
+            ((path, i) for i, coin in enumerate(data['coins']) for path in coin.get('images', [])))
+        conn.executemany(
+            "INSERT INTO stats_fts (rowid, stats) VALUES (?, ?)",
+            ((i, stats_text(coin, data['folder_map'])) for i, coin in enumerate(data['coins'])))
+        conn.executemany(
+            "INSERT INTO search_fts (rowid, text) VALUES (?, ?)",
+            ((i, search_text(coin, data['folder_map'])) for i, coin in enumerate(data['coins'])))
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+# --- READ-ONLY CONNECTIONS ---
+_local = threading.local()
+
+def connect(path):
+    """This thread's read-only connection to the store, reopened when the file is replaced.
+
+    Connections are never shared across threads or inherited across fork().
+    """
+    st = os.stat(path)
+    key = (os.getpid(), path, st.st_ino, st.st_mtime_ns)
+    if getattr(_local, 'key', None) != key:
+        if getattr(_local, 'conn', None) is not None and _local.key[0] == os.getpid():
+            _local.conn.close()
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        conn.execute("PRAGMA query_only = 1")
+        if conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()[0] != str(STORE_FORMAT):
+            conn.close()
+            raise ValueError(f"{path} has an unsupported store format")
+        _local.conn, _local.key = conn, key
+    return _local.conn
+
+def get_meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+# --- QUERIES ---
+def facet_names(conn):
+    """{'category': {name: Hebrew name}, 'series': {...}} of every Hebrew and English name"""
+    names = {}
+    for facet in ('category', 'series'):
+        names[facet] = {}
+        for he, en in conn.execute(f"SELECT DISTINCT {facet}_he, {facet}_en FROM coins"):
+            names[facet].update({en: he, he: he})
+    return names
+
+def year_range(conn):
+    """(first, last) Gregorian year of the coins, None when no coin has one"""
+    low, high = conn.execute("SELECT MIN(year_num), MAX(year_num) FROM coins").fetchone()
+    return (low, high) if low is not None else None
+
+def iter_docs(conn, column='doc'):
+    """The serialized coins (or with column='summary' their summaries) in catalog order, read row by row"""
+    for (doc,) in conn.execute(f"SELECT {column} FROM coins ORDER BY id"):
+        yield doc
+
+def data_body(conn):
+    """/api/data as UTF-8 bytes, assembled from the stored documents without parsing them"""
+    docs = ','.join(iter_docs(conn))
+    # Same key order as the app's sorted JSON output
+    body = f'{{"coins":[{docs}],"config":{get_meta(conn, "config")},"sprites":{get_meta(conn, "sprites")}}}'
+    return body.encode('utf-8')
+
+def summary_body(conn):
+    """/api/summary as UTF-8 bytes, assembled like data_body()"""
+    docs = ','.join(iter_docs(conn, 'summary'))
+    version = json.dumps(get_meta(conn, 'version'))
+    body = (f'{{"coins":[{docs}],"config":{get_meta(conn, "config")},"sprites":{get_meta(conn, "sprites")},'
+            f'"version":{version}}}')
+    return body.encode('utf-8')
+
+def load_docs(conn, ids, column='doc'):
+    """id -> parsed document of the given coins"""
+    docs = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        docs.update(conn.execute(
+            f"SELECT id, {column} FROM coins WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+    return {i: json.loads(doc) for i, doc in docs.items()}
+
+def view_coins(conn, category):
+    """id -> the names and year catalog_views needs, of the coins in a category (Hebrew or English name)"""
+    rows = conn.execute(
+        "SELECT id, category_he, category_en, series_he, series_en, year, name_he, name_en FROM coins "
+        "WHERE category_he = ? OR category_en = ? ORDER BY id", (category, category))
+    return {i: {'category': {'he': cat_he, 'en': cat_en}, 'series': {'he': series_he, 'en': series_en},
+                'year': year, 'name': {'he': name_he, 'en': name_en}}
+            for i, cat_he, cat_en, series_he, series_en, year, name_he, name_en in rows}
+
+def search(conn, query):
+    """Ids of the coins matching every word of the query, ranked like search_index.search()"""
+    words = search_index.tokenize(query)
+    if not words:
+        return []
+
+    totals = None
+    for word in dict.fromkeys(words):
+        # Tokens never contain a double quote, so each word is a safe FTS5 string
+        scores = {i: search_index.PREFIX_SCORE for (i,) in conn.execute(
+            "SELECT rowid FROM search_fts WHERE search_fts MATCH ?", (f'"{word}"*',))}
+        if totals is not None:
+            scores = {i: score for i, score in scores.items() if i in totals}
+        for (i,) in conn.execute("SELECT rowid FROM search_fts WHERE search_fts MATCH ?", (f'"{word}"',)):
+            if i in scores:
+                scores[i] = search_index.EXACT_SCORE
+        totals = scores if totals is None else {i: totals[i] + score for i, score in scores.items()}
+        if not totals:
+            return []
+    return sorted(totals, key=lambda i: (-totals[i], i))
+
+def image_coins(conn, paths):
+    """Image path -> coin of the given photos (those the store knows)"""
+    rows = conn.execute(
+        f"SELECT images.path, coins.doc FROM images JOIN coins ON coins.id = images.coin "
+        f"WHERE images.path IN ({','.join('?' * len(paths))})", paths).fetchall() if paths else []
+    return {path: json.loads(doc) for path, doc in rows}
+
+def find_by_slug(conn, slug):
+    """The first coin with this slug, or None"""
+    row = conn.execute("SELECT doc FROM coins WHERE slug = ? ORDER BY id LIMIT 1", (slug,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def query_coins(conn, category=None, series=None, year_from=None, year_to=None, stats=None, limit=None, offset=0):
+    """(total, coins) matching every given filter, in catalog order, optionally one page of them.
+
+    Category and series match the Hebrew or English name; `stats` is full-text
+    matched (every word) against details.json keys and values.
+    """
+    where, params = [], []
+    if category:
+        where.append("(category_he = ? OR category_en = ?)")
+        params += [category, category]
+    if series:
+        where.append("(series_he = ? OR series_en = ?)")
+        params += [series, series]
+    if year_from is not None:
+        where.append("year_num >= ?")
+        params.append(year_from)
+    if year_to is not None:
+        where.append("year_num <= ?")
+        params.append(year_to)
+    if stats is not None:
+        words = search_index.tokenize(stats)
+        if not words:
+            return 0, []
+        where.append("id IN (SELECT rowid FROM stats_fts WHERE stats_fts MATCH ?)")
+        params.append(' '.join(f'"{word}"' for word in words))
+
+    sql = "SELECT id FROM coins"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    ids = [i for (i,) in conn.execute(sql + " ORDER BY id", params)]
+    page = ids[offset:offset + limit] if limit is not None else ids
+
+    # Only the documents of the requested page are read and parsed
+    docs = load_docs(conn, page)
+    return len(ids), [docs[i] for i in page]
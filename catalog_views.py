@@ -0,0 +1,152 @@
+import re
+import math
+from functools import cmp_to_key
+
+# The grouped, ordered views the gallery renders (by year, by coin type, and
+# the collector sets), computed on the server with the ordering rules the page
+# used to apply itself on every tab switch: order.json's series_order and
+# coin_order, then the Gregorian year of folder names like 'תשלד (1974)', then
+# the coin's face value. Coins are referenced by their index in the catalog,
+# which is also their index in /api/summary.
+
+MODES = ('year', 'coin', 'sets')
+UNRANKED = 9999
+UNRANKED_SERIES = 999  # what the year and sets views used for a series missing from series_order
+
+YEAR_RE = re.compile(r'(\d{4})')
+NUMBER_RE = re.compile(r'([\d\.]+)')
+JS_FLOAT_RE = re.compile(r'\d+\.?\d*|\.\d+')
+
+def canonical(obj):
+    if not obj:
+        return ''
+    if isinstance(obj, str):
+        return obj
+    return obj.get('he') or ''
+
+def extract_year(text):
+    match = YEAR_RE.search(str(text)) if text else None
+    return int(match.group(1)) if match else UNRANKED
+
+def js_float(text):
+    """parseFloat() of a string: its leading number, NaN if there is none"""
+    match = JS_FLOAT_RE.match(text) if text is not None else None
+    return float(match.group(0)) if match else math.nan
+
+def numeric_value(name_obj):
+    """Face value of a coin name like '10 אגורות' or '1/2 לירה' (0 if it has none)"""
+    name = canonical(name_obj)
+    if '/' in name:
+        parts = name.split('/')
+        num = NUMBER_RE.search(parts[0])
+        den = NUMBER_RE.search(parts[1])
+        num = js_float(num.group(0)) if num else math.nan
+        den = js_float(den.group(0)) if den else math.nan
+        if num and den and not math.isnan(num) and not math.isnan(den):
+            return num / den
+    match = NUMBER_RE.search(name)
+    return js_float(match.group(0)) if match else 0
+
+def compare(diff):
+    """A JS sort comparator result: NaN counts as equal"""
+    return 0 if math.isnan(diff) else diff
+
+def series_index(config, series_he, missing):
+    order = config.get('series_order') or []
+    return order.index(series_he) if series_he in order else missing
+
+def coin_index(config, series_he, name_he):
+    order = (config.get('coin_order') or {}).get(series_he) or []
+    return order.index(name_he) if name_he in order else -1
+
+def section_id(key):
+    return 'section-' + re.sub(r'\s+', '-', key).replace('(', '').replace(')', '')
+
+def group_by(indexes, key):
+    groups = {}
+    for i in indexes:
+        groups.setdefault(key(i), []).append(i)
+    return groups
+
+def year_view(coins, config, indexes):
+    """Year sections, each with its series in series_order and their rows of coins.
+
+    A coin type with several coins that year (subtypes) gets a row of its own;
+    consecutive single coins share a row.
+    """
+    groups = group_by(indexes, lambda i: coins[i]['year'])
+    sections = []
+    for year in sorted(groups, key=extract_year):
+        by_series = group_by(groups[year], lambda i: canonical(coins[i]['series']))
+        series_list = []
+        for series_he in sorted(by_series, key=lambda s: series_index(config, s, UNRANKED_SERIES)):
+            by_name = group_by(by_series[series_he], lambda i: canonical(coins[i]['name']))
+
+            def by_coin_order(a, b):
+                ia, ib = coin_index(config, series_he, a), coin_index(config, series_he, b)
+                if ia != -1 and ib != -1:
+                    return ia - ib
+                if ia != -1:
+                    return -1
+                if ib != -1:
+                    return 1
+                return compare(numeric_value(a) - numeric_value(b))
+
+            rows, singles = [], []
+            for name_he in sorted(by_name, key=cmp_to_key(by_coin_order)):
+                if len(by_name[name_he]) > 1:
+                    if singles:
+                        rows.append(singles)
+                        singles = []
+                    rows.append(by_name[name_he])
+                else:
+                    singles.append(by_name[name_he][0])
+            if singles:
+                rows.append(singles)
+            series_list.append({'series': coins[by_series[series_he][0]]['series'], 'rows': rows})
+        sections.append({'id': section_id(year), 'key': year, 'series': series_list})
+    return sections
+
+def coin_view(coins, config, indexes):
+    """One section per coin type, in series and coin_order order, with its coins by year"""
+    groups = group_by(indexes, lambda i: f"{canonical(coins[i]['name'])} ({canonical(coins[i]['series'])})")
+
+    def by_rank(a, b):
+        coin_a, coin_b = coins[groups[a][0]], coins[groups[b][0]]
+        series_a, series_b = canonical(coin_a['series']), canonical(coin_b['series'])
+        rank_a = series_index(config, series_a, UNRANKED)
+        rank_b = series_index(config, series_b, UNRANKED)
+        if rank_a != rank_b:
+            return rank_a - rank_b
+        rank_a = coin_index(config, series_a, canonical(coin_a['name']))
+        rank_b = coin_index(config, series_b, canonical(coin_b['name']))
+        rank_a, rank_b = (UNRANKED if r == -1 else r for r in (rank_a, rank_b))
+        if rank_a != rank_b:
+            return rank_a - rank_b
+        return compare(numeric_value(coin_a['name']) - numeric_value(coin_b['name']))
+
+    sections = []
+    for key in sorted(groups, key=cmp_to_key(by_rank)):
+        sections.append({**section(coins, groups, key), 'name': coins[groups[key][0]]['name']})
+    return sections
+
+def sets_view(coins, config, indexes):
+    """One section per series of sets, in series_order order, with its sets by year"""
+    groups = group_by(indexes, lambda i: canonical(coins[i]['series']))
+    return [section(coins, groups, key)
+            for key in sorted(groups, key=lambda s: series_index(config, s, UNRANKED_SERIES))]
+
+def section(coins, groups, key):
+    return {'id': section_id(key), 'key': key, 'series': coins[groups[key][0]]['series'],
+            'coins': sorted(groups[key], key=lambda i: extract_year(coins[i]['year']))}
+
+VIEWS = {'year': year_view, 'coin': coin_view, 'sets': sets_view}
+
+def build_view(coins, config, category, mode):
+    """{'category', 'mode', 'sections'} of the coins whose category (Hebrew or English name) matches.
+
+    `coins` is the catalog's list of coins, or a dict of some of them by their index.
+    """
+    indexes = [i for i, coin in (coins.items() if isinstance(coins, dict) else enumerate(coins))
+               if category in ((coin.get('category') or {}).get('he'), (coin.get('category') or {}).get('en'))]
+    return {'category': category, 'mode': mode, 'sections': VIEWS[mode](coins, config or {}, indexes)}
@@ -0,0 +1,100 @@
+import re
+
+# Compact form of /api/data (?format=compact). Coins keep their keys, but values
+# repeated across the catalog are replaced by integer ids into lookup tables:
+#   names    [he, en] of categories, series, coin names and subtypes
+#   dirs     folders of the images as [parent dir id or null, name], so the
+#            category/series/year prefixes are sent once
+#   stats    distinct details.json dicts (a denomination repeats them every year)
+#   ladders  [[size, width], ...] of the thumbnail srcsets
+# and URLs the client can rebuild from the image path are reduced to their
+# fingerprint. Any value that doesn't fit the pattern is sent as is, so
+# expandCatalog() in index.html always gives back the exact full form.
+
+FORMAT = 'compact-1'
+
+SRCSET_RE = re.compile(r'(\S+)\?w=(\d+) (\d+)w$')
+
+def url_fingerprint(tables, url, folder, img_path):
+    """The fingerprint of a media URL (0 when it has none), or None if it isn't the URL of img_path"""
+    if url == tables.media_url(folder, img_path):
+        return 0
+    fingerprint = url.split('/')[2] if url.startswith('/v/') else None
+    return fingerprint if fingerprint and url == tables.media_url(folder, img_path, fingerprint) else None
+
+def split_srcset(srcset):
+    """(url, [[size, width], ...]) of a srcset whose entries all share one URL, else None"""
+    entries = [SRCSET_RE.match(entry) for entry in srcset.split(', ')]
+    if not all(entries) or len({m.group(1) for m in entries}) != 1:
+        return None
+    return entries[0].group(1), [[int(m.group(2)), int(m.group(3))] for m in entries]
+
+class Tables:
+    """Lookup tables filled while coins are compacted; values are keyed by their JSON text"""
+
+    def __init__(self, dumps, media_url):
+        self.dumps = dumps
+        self.media_url = media_url
+        self.tables = {'names': [], 'dirs': [], 'stats': [], 'ladders': []}
+        self.ids = {name: {} for name in self.tables}
+
+    def id(self, table, value):
+        key = self.dumps(value)
+        ids = self.ids[table]
+        if key not in ids:
+            ids[key] = len(self.tables[table])
+            self.tables[table].append(value)
+        return ids[key]
+
+    def dir_id(self, path):
+        parent, _, name = path.rpartition('/')
+        return self.id('dirs', [self.dir_id(parent) if parent else None, name])
+
+def compact_images(tables, images):
+    """[dir id, file, file...] when the images share a folder, else the list itself"""
+    dirs = {path.rpartition('/')[0] for path in images}
+    if len(dirs) != 1 or not all('/' in path for path in images):
+        return images
+    return [tables.dir_id(dirs.pop())] + [path.rpartition('/')[2] for path in images]
+
+def compact_coin(tables, coin):
+    out = dict(coin)
+    for field in ('category', 'series', 'name', 'subtype'):
+        obj = coin.get(field)
+        if isinstance(obj, dict) and set(obj) == {'he', 'en'}:
+            out[field] = tables.id('names', [obj['he'], obj['en']])
+    if isinstance(coin.get('stats'), dict):
+        out['stats'] = tables.id('stats', coin['stats'])
+
+    images = coin.get('images')
+    thumb_src = coin.get('thumb_src')
+    if isinstance(images, list) and images:
+        out['images'] = compact_images(tables, images)
+        if 'image_urls' in coin and len(coin['image_urls']) == len(images):
+            fingerprints = [url_fingerprint(tables, url, 'images', path)
+                            for url, path in zip(coin['image_urls'], images)]
+            if None not in fingerprints:
+                out['image_urls'] = fingerprints
+        if thumb_src in images:
+            out['thumb_src'] = images.index(thumb_src)
+
+    if isinstance(thumb_src, str):
+        thumb_url = coin.get('thumb_url')
+        fingerprint = url_fingerprint(tables, thumb_url, 'thumbnails', thumb_src) if thumb_url else None
+        if fingerprint:
+            out['thumb_url'] = fingerprint
+        srcset = split_srcset(coin['thumb_srcset']) if coin.get('thumb_srcset') else None
+        # The srcset URL is the thumbnail's own, with the thumb_url fingerprint if it has one
+        if srcset and srcset[0] == tables.media_url('thumbnails', thumb_src, fingerprint or None):
+            out['thumb_srcset'] = tables.id('ladders', srcset[1])
+    return out
+
+def compact(data, dumps, media_url):
+    """Compact form of an /api/data body. `dumps` is the app's JSON serializer and
+    `media_url` its URL builder, which the client's rebuilt URLs must match.
+
+    Top-level keys other than 'coins' (config, sprites, version...) are kept as is.
+    """
+    tables = Tables(dumps, media_url)
+    coins = [compact_coin(tables, coin) for coin in data['coins']]
+    return {**data, 'format': FORMAT, **tables.tables, 'coins': coins}
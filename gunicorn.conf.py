@@ -0,0 +1,25 @@
+import gc
+
+# gunicorn picks this file up from the working directory (see the Procfile).
+#
+# app.py is imported once in the master, which builds the catalog, the slug
+# index, the search index and the compressed /api/data payload before forking.
+# Workers get all of it copy-on-write: they start serving at once instead of each
+# rescanning the tree, and memory stays flat as workers are added. The payloads
+# are large bytes objects whose pages are never written after the build, so they
+# stay shared for the life of the worker.
+preload_app = True
+
+# No collections while the master builds; everything it allocated is then frozen
+# so the workers' collector never walks (and dirties) those pages
+gc.disable()
+
+def when_ready(server):
+    import app
+    version, count = app.warm_up()
+    server.log.info("Catalog version %s preloaded: %d coins", version, count)
+    if app.metrics.ENABLED and server.cfg.workers > 1:
+        server.log.warning("METRICS=1 with %d workers: /metrics only reports the worker that "
+                           "answers each scrape. Run a single worker to monitor it", server.cfg.workers)
+    gc.freeze()
+    gc.enable()
@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+
+# Minimal in-process metrics with a Prometheus text exposition, served by the
+# app at /metrics. Off unless METRICS=1: every recording function then returns
+# right away, so the instrumented hot paths cost a function call and a flag check.
+#
+# Values are per process and nothing is shared between gunicorn workers, so
+# /metrics is meant for single-worker deployments (--workers 1, scaling with
+# --threads). With several workers each scrape reads whichever worker answered:
+# counters jump between unrelated series and rates are meaningless. gunicorn
+# logs a warning at startup when METRICS=1 is combined with more than one worker.
+
+ENABLED = os.environ.get('METRICS', '0') == '1'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help); only declared metrics can be recorded
+METRICS = {
+    'coins_http_request_duration_seconds': ('histogram', "Request latency by route, method and status"),
+    'coins_http_response_bytes_total': ('counter', "Bytes of files served, by folder (images, thumbnails, sprites)"),
+    'coins_scan_duration_seconds': ('histogram', "Duration of scan_collection() runs"),
+    'coins_scan_phase_seconds_total': ('counter', "Time spent per scan phase, summed over scan threads"),
+    'coins_cache_requests_total': ('counter', "Cache lookups by cache and result (hit or miss)"),
+    'coins_thumbnails_rendered_total': ('counter', "Thumbnails and variants rendered on demand, by result"),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [count per bucket..., sum, count]
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError(f"undeclared metric {name}")
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        buckets = _histograms.get(key)
+        if buckets is None:
+            buckets = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+                break
+        buckets[-2] += value
+        buckets[-1] += 1
+
+def clock():
+    """Start time for add_time()/observe_since(), or 0 when metrics are off (no clock read)"""
+    return time.perf_counter() if ENABLED else 0.0
+
+def add_time(name, start, **labels):
+    """Add the seconds since `start` to a counter"""
+    if ENABLED:
+        inc(name, time.perf_counter() - start, **labels)
+
+def observe_since(name, start, **labels):
+    if ENABLED:
+        observe(name, time.perf_counter() - start, **labels)
+
+def cache(cache_name, hit):
+    inc('coins_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def render():
+    """Every recorded metric in the Prometheus text format (version 0.0.4)"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(buckets) for key, buckets in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), buckets in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {buckets[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {buckets[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {buckets[-1]}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,175 @@
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# Perceptual hashes (64-bit DCT pHash) of every image under images/, packed into
+# one uint64 array so a photo is compared against the whole collection with a
+# single vectorized XOR + popcount. Used by /api/similar in the app, and from the
+# command line to build the index and report duplicate photos.
+
+SOURCE_FOLDER = 'images'
+HASH_FILE = os.path.join('thumbnails', 'phash.npz')
+ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+WORKERS = 8
+
+HASH_SIZE = 8  # 8x8 low-frequency DCT block -> 64 bits
+DCT_SIZE = 32
+# Images are decoded at 1/4 scale (much faster for big JPEGs) unless that gets too small
+REDUCED_MIN_SIDE = 2 * DCT_SIZE
+DUPLICATE_DISTANCE = 6
+
+# popcount of every byte, for NumPy versions without np.bitwise_count
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+def is_image(filename):
+    return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
+
+def decode_gray(data):
+    """Grayscale image from encoded bytes, or None if it can't be decoded"""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if not buf.size:
+        return None  # imdecode raises on an empty buffer
+    try:
+        img = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if img is None or min(img.shape[:2]) < REDUCED_MIN_SIDE:
+            img = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+    except cv2.error:
+        return None
+    return img
+
+def phash(gray):
+    """64-bit perceptual hash: signs of the low DCT frequencies against their median"""
+    small = cv2.resize(gray, (DCT_SIZE, DCT_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    block = cv2.dct(small)[:HASH_SIZE, :HASH_SIZE].flatten()
+    bits = block > np.median(block[1:])  # the DC term is just the brightness
+    return np.packbits(bits).view('>u8')[0].astype(np.uint64)
+
+def photo_hashes(data):
+    """Hashes of a photo in the four right-angle rotations (coins get photographed any way up)"""
+    gray = decode_gray(data)
+    if gray is None:
+        return None
+    rotations = [gray] + [cv2.rotate(gray, r) for r in
+                          (cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_COUNTERCLOCKWISE)]
+    return np.array([phash(img) for img in rotations], dtype=np.uint64)
+
+def hamming(hashes, query):
+    """Bit distance between every hash and one query hash"""
+    diff = np.bitwise_xor(hashes, query)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(diff)
+    return _BYTE_BITS[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def nearest(index, hashes, limit):
+    """[(path, distance)] of the indexed images closest to any of the query hashes"""
+    if not len(index['hashes']):
+        return []
+    distances = np.min([hamming(index['hashes'], h) for h in hashes], axis=0)
+    limit = min(limit, len(distances))
+    best = np.argpartition(distances, limit - 1)[:limit]
+    best = best[np.lexsort((best, distances[best]))]
+    return [(str(index['paths'][i]), int(distances[i])) for i in best]
+
+# --- INDEX FILE ---
+def load_index(path=HASH_FILE):
+    """{'paths', 'hashes', 'mtimes', 'sizes'} arrays, or None if there's no index"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {key: data[key] for key in ('paths', 'hashes', 'mtimes', 'sizes')}
+
+def save_index(index, path=HASH_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = path + '.tmp.npz'
+    np.savez(tmp_file, **index)
+    os.replace(tmp_file, path)
+
+def find_images():
+    for root, dirs, files in os.walk(SOURCE_FOLDER):
+        dirs.sort()
+        for file in sorted(files):
+            if is_image(file):
+                yield os.path.relpath(os.path.join(root, file), SOURCE_FOLDER).replace("\\", "/")
+
+def hash_image(rel_path):
+    """(rel_path, hash or None, mtime, size)"""
+    source_file = os.path.join(SOURCE_FOLDER, rel_path)
+    st = os.stat(source_file)
+    with open(source_file, 'rb') as f:
+        gray = decode_gray(f.read())
+    return rel_path, (phash(gray) if gray is not None else None), st.st_mtime_ns, st.st_size
+
+def build(force=False):
+    print(f"🚀 Hashing images in '{SOURCE_FOLDER}' into '{HASH_FILE}'...")
+    old = None if force else load_index()
+    known = {}
+    if old is not None:
+        known = {str(p): (h, m, s) for p, h, m, s in zip(old['paths'], old['hashes'], old['mtimes'], old['sizes'])}
+
+    rel_paths = list(find_images())
+    results, todo = {}, []
+    for rel_path in rel_paths:
+        st = os.stat(os.path.join(SOURCE_FOLDER, rel_path))
+        entry = known.get(rel_path)
+        if entry is not None and entry[1] == st.st_mtime_ns and entry[2] == st.st_size:
+            results[rel_path] = entry
+        else:
+            todo.append(rel_path)
+
+    # OpenCV releases the GIL while decoding, so threads are enough
+    errors = 0
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for rel_path, h, mtime, size in pool.map(hash_image, todo):
+            if h is None:
+                errors += 1
+                print(f"❌ Could not decode {rel_path}")
+                continue
+            results[rel_path] = (h, mtime, size)
+
+    paths = [p for p in rel_paths if p in results]
+    save_index({
+        'paths': np.array(paths, dtype=str),
+        'hashes': np.array([results[p][0] for p in paths], dtype=np.uint64),
+        'mtimes': np.array([results[p][1] for p in paths], dtype=np.int64),
+        'sizes': np.array([results[p][2] for p in paths], dtype=np.int64),
+    })
+    print("-" * 30)
+    print(f"Done! Hashed: {len(todo) - errors}, Reused: {len(paths) - (len(todo) - errors)}, Errors: {errors}")
+
+def coin_folder(rel_path):
+    """category/series/year/coin of an image path"""
+    return '/'.join(rel_path.split('/')[:4])
+
+def report_duplicates(max_distance=DUPLICATE_DISTANCE):
+    index = load_index()
+    if index is None:
+        print(f"❌ {HASH_FILE} is missing, build it first")
+        return 1
+
+    paths, hashes = [str(p) for p in index['paths']], index['hashes']
+    folders = np.array([coin_folder(p) for p in paths])
+    pairs = []
+    for i in range(len(paths) - 1):
+        distances = hamming(hashes[i + 1:], hashes[i])
+        # Only pairs in different coin folders - a coin's own photos are expected to look alike
+        for j in np.nonzero((distances <= max_distance) & (folders[i + 1:] != folders[i]))[0]:
+            pairs.append((int(distances[j]), paths[i], paths[i + 1 + j]))
+
+    for distance, a, b in sorted(pairs):
+        print(f"🔁 {distance:2d}  {a}\n      {b}")
+    print("-" * 30)
+    print(f"Found {len(pairs)} near-duplicate pairs (distance <= {max_distance}) in {len(paths)} images")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the perceptual-hash index or report duplicate photos.")
+    parser.add_argument('--force', action='store_true', help="rehash every image, even if unchanged")
+    parser.add_argument('--duplicates', action='store_true', help="report near-duplicate images across coin folders")
+    parser.add_argument('--distance', type=int, default=DUPLICATE_DISTANCE,
+                        help=f"max differing bits for --duplicates (default: {DUPLICATE_DISTANCE})")
+    args = parser.parse_args()
+    if args.duplicates:
+        raise SystemExit(report_duplicates(args.distance))
+    build(force=args.force)
@@ -0,0 +1,90 @@
+import re
+from bisect import bisect_left
+
+# In-memory inverted index over the catalog, used by /api/search. Both the Hebrew
+# folder names and their English translations are indexed, and Hebrew is
+# normalized so 'תשל"ד', 'תשלד' and pointed text all match the same coins.
+
+# Cantillation marks and niqqud (U+0591-U+05C7), except maqaf, which separates words
+NIQQUD_RE = re.compile('[\u0591-\u05BD\u05BF-\u05C7]')
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+# Geresh/gershayim inside abbreviations (תשל"ד, מ"מ) are dropped instead of splitting the word
+QUOTES_RE = re.compile('["\'\u05F3\u05F4]')
+TOKEN_RE = re.compile(r'\d+(?:\.\d+)?|[^\W_]+')
+
+# Ranking: a query word that matches a whole token counts more than a prefix match
+EXACT_SCORE = 2
+PREFIX_SCORE = 1
+
+def normalize(text):
+    text = NIQQUD_RE.sub('', str(text)).replace('\u05BE', ' ')
+    return QUOTES_RE.sub('', text.translate(FINAL_LETTERS).casefold())
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+def stat_values(value):
+    """Every string inside a details.json value (plain, {'he', 'en'} or a list)"""
+    if isinstance(value, dict):
+        for v in value.values():
+            yield from stat_values(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from stat_values(v)
+    elif value is not None:
+        yield str(value)
+
+def coin_texts(coin, folder_map):
+    """The searchable strings of a coin, in Hebrew and English"""
+    for field in ('category', 'series', 'name', 'subtype'):
+        if coin.get(field):
+            yield coin[field]['he']
+            yield coin[field]['en']
+    # Folder names like 'תשלד (1974)' carry both the Hebrew and the Gregorian year
+    yield coin.get('year', '')
+    for value in (coin.get('stats') or {}).values():
+        for text in stat_values(value):
+            yield text
+            yield folder_map.get(text, '')
+
+def build_index(coins, folder_map):
+    """{'postings': token -> sorted coin indexes, 'tokens': sorted tokens for prefix lookups}"""
+    postings = {}
+    for i, coin in enumerate(coins):
+        for text in coin_texts(coin, folder_map):
+            for token in tokenize(text):
+                indexes = postings.setdefault(token, [])
+                if not indexes or indexes[-1] != i:
+                    indexes.append(i)
+    return {'postings': postings, 'tokens': sorted(postings)}
+
+def match_token(index, word):
+    """Coin index -> score for one query word, matching whole tokens and prefixes"""
+    tokens = index['tokens']
+    scores = {}
+    pos = bisect_left(tokens, word)
+    while pos < len(tokens) and tokens[pos].startswith(word):
+        token = tokens[pos]
+        score = EXACT_SCORE if token == word else PREFIX_SCORE
+        for i in index['postings'][token]:
+            if scores.get(i, 0) < score:
+                scores[i] = score
+        pos += 1
+    return scores
+
+def search(index, query):
+    """Coin indexes matching every word of the query (as a word or word prefix), best first"""
+    words = tokenize(query)
+    if not words:
+        return []
+
+    totals = None
+    # Rarest words first, so the intersection shrinks as early as possible
+    for scores in sorted((match_token(index, w) for w in dict.fromkeys(words)), key=len):
+        if totals is None:
+            totals = scores
+        else:
+            totals = {i: total + scores[i] for i, total in totals.items() if i in scores}
+        if not totals:
+            return []
+    return sorted(totals, key=lambda i: (-totals[i], i))
@@ -0,0 +1,148 @@
+import os
+import io
+import json
+import math
+import hashlib
+import argparse
+from PIL import Image, features
+
+import app
+
+# Packs the primary thumbnail (thumb_src) of every coin in a series into a few
+# sprite sheets, so the grid loads a series in a handful of requests instead of
+# one per coin. Run after thumbnailsGenerater.py; the map it writes
+# (app.SPRITE_MAP_FILE) is picked up by the app, or by catalog_builder.py.
+#
+# Map layout:
+#   cell:   side of the square cell every thumbnail is fitted and centered into
+#   series: '<category>/<series>' -> key of its thumbnails and the sheets built from them
+#   sheets: name -> file, width, height
+#   thumbs: thumb_src -> [sheet name, x, y] of its cell
+
+CELL_SIZE = 360  # 2x the 180px card image
+SHEET_COLUMNS = 8
+SHEET_CELLS = 64
+SHEET_FORMAT = 'webp' if features.check('webp') else 'png'
+
+def load_map():
+    data = app.get_json_data(app.SPRITE_MAP_FILE)
+    if data.get('cell') != CELL_SIZE:
+        return {'cell': CELL_SIZE, 'series': {}, 'sheets': {}, 'thumbs': {}}
+    return data
+
+def save_map(sprite_map):
+    tmp_file = app.SPRITE_MAP_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(sprite_map, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_file, app.SPRITE_MAP_FILE)
+
+def series_thumbs(coins):
+    """'<category>/<series>' -> primary thumbnails of its coins, in catalog order"""
+    series = {}
+    for coin in coins:
+        if not coin.get('thumb_available'):
+            continue
+        thumb = coin['thumb_src']
+        if not os.path.isfile(os.path.join(app.THUMB_FOLDER, thumb)):
+            continue  # not generated yet - the card keeps its own <img>
+        thumbs = series.setdefault('/'.join(thumb.split('/')[:2]), [])
+        if thumb not in thumbs:
+            thumbs.append(thumb)
+    return series
+
+def thumbs_key(thumbs):
+    """Changes when a thumbnail is added, removed or rewritten"""
+    h = hashlib.sha1(f"{SHEET_FORMAT}\n".encode('utf-8'))
+    for thumb in thumbs:
+        st = os.stat(os.path.join(app.THUMB_FOLDER, thumb))
+        h.update(f"{thumb}:{st.st_mtime_ns}:{st.st_size}\n".encode('utf-8'))
+    return h.hexdigest()
+
+def pack_sheet(thumbs):
+    """Draw thumbs into one sheet. Returns (sheet entry, name, {thumb: (x, y)})"""
+    columns = min(SHEET_COLUMNS, len(thumbs))
+    rows = math.ceil(len(thumbs) / columns)
+    sheet = Image.new('RGBA', (columns * CELL_SIZE, rows * CELL_SIZE), (0, 0, 0, 0))
+    positions = {}
+
+    for i, thumb in enumerate(thumbs):
+        x, y = (i % columns) * CELL_SIZE, (i // columns) * CELL_SIZE
+        with Image.open(os.path.join(app.THUMB_FOLDER, thumb)) as img:
+            img = img.convert('RGBA')
+            img.thumbnail((CELL_SIZE, CELL_SIZE))
+            sheet.paste(img, (x + (CELL_SIZE - img.width) // 2, y + (CELL_SIZE - img.height) // 2), img)
+        positions[thumb] = (x, y)
+
+    buf = io.BytesIO()
+    if SHEET_FORMAT == 'webp':
+        sheet.save(buf, format='WEBP', quality=80)
+    else:
+        sheet.save(buf, format='PNG', optimize=True)
+    data = buf.getvalue()
+
+    # Content-hashed name, so the app can serve sheets as immutable
+    name = hashlib.sha256(data).hexdigest()[:16]
+    file_name = f"{name}.{SHEET_FORMAT}"
+    tmp_file = os.path.join(app.SPRITE_FOLDER, file_name + '.tmp')
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, os.path.join(app.SPRITE_FOLDER, file_name))
+    return {'file': file_name, 'width': sheet.width, 'height': sheet.height}, name, positions
+
+def generate(force=False):
+    print(f"🚀 Building sprite sheets in '{app.SPRITE_FOLDER}'...")
+    os.makedirs(app.SPRITE_FOLDER, exist_ok=True)
+
+    app.reset_scan_state()
+    coins = app.scan_collection()
+    old_map = load_map()
+    # Sheets of the map being replaced, even one of another cell size
+    old_sheets = app.get_json_data(app.SPRITE_MAP_FILE).get('sheets') or {}
+    new_map = {'cell': CELL_SIZE, 'series': {}, 'sheets': {}, 'thumbs': {}}
+    built = reused = 0
+
+    for series, thumbs in series_thumbs(coins).items():
+        key = thumbs_key(thumbs)
+        previous = old_map['series'].get(series)
+        sheet_names = previous['sheets'] if previous and previous['key'] == key and not force else None
+
+        if sheet_names and all(os.path.isfile(os.path.join(app.SPRITE_FOLDER, old_map['sheets'][n]['file']))
+                               for n in sheet_names):
+            # Unchanged series - keep its sheets
+            for name in sheet_names:
+                new_map['sheets'][name] = old_map['sheets'][name]
+            new_map['thumbs'].update({t: old_map['thumbs'][t] for t in thumbs})
+            reused += 1
+        else:
+            sheet_names = []
+            for start in range(0, len(thumbs), SHEET_CELLS):
+                sheet, name, positions = pack_sheet(thumbs[start:start + SHEET_CELLS])
+                new_map['sheets'][name] = sheet
+                new_map['thumbs'].update({t: [name, x, y] for t, (x, y) in positions.items()})
+                sheet_names.append(name)
+            built += 1
+            print(f"✅ {series}: {len(thumbs)} thumbnails in {len(sheet_names)} sheet(s)")
+        new_map['series'][series] = {'key': key, 'sheets': sheet_names}
+
+    save_map(new_map)
+
+    # Remove sheets neither this map nor the previous one uses. Pages and workers
+    # still on the previous catalog version keep loading its sheets until they
+    # pick up the new map, so those go on the next run
+    files = {sheet['file'] for sheet in new_map['sheets'].values()}
+    files.update(sheet['file'] for sheet in old_sheets.values())
+    removed = 0
+    for f in os.listdir(app.SPRITE_FOLDER):
+        if f.endswith('.' + SHEET_FORMAT) and f not in files:
+            os.remove(os.path.join(app.SPRITE_FOLDER, f))
+            removed += 1
+
+    print("-" * 30)
+    print(f"Done! Series built: {built}, Reused: {reused}, Sheets: {len(new_map['sheets'])}, "
+          f"Removed: {removed}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack each series' thumbnails into sprite sheets.")
+    parser.add_argument('--force', action='store_true', help="rebuild every sheet, even if up to date")
+    args = parser.parse_args()
+    generate(force=args.force)
@@ -1,5 +1,10 @@
 import os
-from PIL import Image
+import io
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps, features
 
 # Configuration
 SOURCE_FOLDER = 'images'
@@ -7,53 +12,190 @@ DEST_FOLDER = 'thumbnails'
 MAX_SIZE = (400, 400)  # Max width/height in pixels
 ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
 
+# Responsive variants: each size is a max width/height box, written as
+# '<thumbnail>@<size>.<format>' for every modern format this Pillow build supports
+VARIANT_SIZES = (160, 320, 640, 1280)
+VARIANT_FORMATS = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+VARIANT_QUALITY = {'avif': 60, 'webp': 80}
+
+# Per source image: the state it was thumbnailed from (mtime, size, sha256), used to
+# regenerate thumbnails whose original was replaced, the generated thumbnail
+# ('thumb': width, height, bytes, sha256), which the app reads instead of probing
+# files, and its responsive 'variants'
+MANIFEST_FILE = os.path.join(DEST_FOLDER, 'manifest.json')
+
 def is_image(filename):
     return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
 
-def generate():
+def load_manifest():
+    if os.path.exists(MANIFEST_FILE):
+        try:
+            with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable manifest {MANIFEST_FILE}: {e}")
+    return {}
+
+def save_manifest(manifest):
+    os.makedirs(DEST_FOLDER, exist_ok=True)
+    tmp_file = MANIFEST_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+def find_images(only=None):
+    """Relative ('/' separated) paths of every source image, optionally limited to a subtree"""
+    start = os.path.join(SOURCE_FOLDER, only) if only else SOURCE_FOLDER
+    for root, dirs, files in os.walk(start):
+        dirs.sort()
+        for file in sorted(files):
+            if is_image(file):
+                yield os.path.relpath(os.path.join(root, file), SOURCE_FOLDER).replace("\\", "/")
+
+def process_image(rel_path, entry, force=False):
+    """Create or refresh one thumbnail and its size variants. Runs in a worker process.
+
+    Returns (rel_path, status, manifest entry, error) where status is one of
+    'created', 'updated', 'skipped' or 'error'.
+    """
+    source_file = os.path.join(SOURCE_FOLDER, rel_path)
+    dest_file = os.path.join(DEST_FOLDER, rel_path)
+    try:
+        st = os.stat(source_file)
+        exists = os.path.exists(dest_file)
+        stale = force or not exists
+        state = None
+        data = None
+
+        if not stale:
+            # Unchanged mtime and size - nothing to do
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                state = dict(entry)
+            # Thumbnail from before the manifest existed - adopt it if it's newer than the original
+            elif not entry and os.stat(dest_file).st_mtime_ns >= st.st_mtime_ns:
+                state = source_state(source_file, st)
+
+        if state is None:
+            with open(source_file, 'rb') as f:
+                data = f.read()
+            state = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'sha256': hashlib.sha256(data).hexdigest()}
+            # Touched but identical content - keep the thumbnail
+            if not stale and entry and entry.get('sha256') == state['sha256']:
+                state.update({k: entry[k] for k in ('thumb', 'variants') if k in entry})
+            else:
+                stale = True
+
+        if not stale and not variants_missing(state):
+            return rel_path, 'skipped', with_thumb_state(state, dest_file), None
+
+        if data is None:
+            with open(source_file, 'rb') as f:
+                data = f.read()
+
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            if stale:
+                thumb = img.copy()
+                thumb.thumbnail(MAX_SIZE)
+                save_atomic(thumb, dest_file, Image.registered_extensions()[os.path.splitext(dest_file)[1].lower()])
+                state['thumb'] = thumb_state(dest_file)
+            state['variants'] = write_variants(img, dest_file)
+
+        status = 'updated' if exists else 'created'
+        return rel_path, status, with_thumb_state(state, dest_file), None
+    except Exception as e:
+        return rel_path, 'error', entry, str(e)
+
+def save_atomic(img, dest_file, image_format, **params):
+    # Write next to the target and rename, so the app never serves a half-written file
+    os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+    tmp_file = dest_file + '.tmp'
+    img.save(tmp_file, format=image_format, **params)
+    os.replace(tmp_file, dest_file)
+
+def variant_file(dest_file, size, fmt):
+    return f"{dest_file}@{size}.{fmt}"
+
+def variants_missing(state):
+    """True if the entry has no variants yet, or lacks a format this Pillow can write"""
+    if 'variants' not in state:
+        return True
+    return any(set(VARIANT_FORMATS) - set(v['formats']) for v in state['variants'])
+
+def write_variants(img, dest_file):
+    """Write the VARIANT_SIZES ladder (never upscaled) in every VARIANT_FORMATS format"""
+    variants = []
+    largest = max(img.size)
+    for size in VARIANT_SIZES:
+        if variants and size > largest:
+            break
+        variant = img.copy()
+        variant.thumbnail((size, size))
+        has_alpha = 'A' in variant.getbands() or 'transparency' in variant.info
+        variant = variant.convert('RGBA' if has_alpha else 'RGB')
+        for fmt in VARIANT_FORMATS:
+            save_atomic(variant, variant_file(dest_file, size, fmt), fmt.upper(), quality=VARIANT_QUALITY[fmt])
+        variants.append({'size': size, 'width': variant.width, 'height': variant.height, 'formats': list(VARIANT_FORMATS)})
+    return variants
+
+def source_state(source_file, st):
+    h = hashlib.sha256()
+    with open(source_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return {'mtime': st.st_mtime_ns, 'size': st.st_size, 'sha256': h.hexdigest()}
+
+def thumb_state(dest_file):
+    with open(dest_file, 'rb') as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+    return {'width': width, 'height': height, 'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+def with_thumb_state(state, dest_file, thumb=None):
+    """Copy of a manifest entry that is sure to describe its thumbnail"""
+    thumb = thumb or state.get('thumb') or thumb_state(dest_file)
+    return {**state, 'thumb': thumb}
+
+def generate(force=False, only=None, workers=None):
     print(f"🚀 Starting thumbnail generation from '{SOURCE_FOLDER}' to '{DEST_FOLDER}'...")
-    
-    processed_count = 0
-    skipped_count = 0
-    error_count = 0
 
-    for root, dirs, files in os.walk(SOURCE_FOLDER):
-        # Determine destination path mirroring the source
-        relative_path = os.path.relpath(root, SOURCE_FOLDER)
-        target_dir = os.path.join(DEST_FOLDER, relative_path)
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0}
+    manifest = load_manifest()
+    rel_paths = list(find_images(only))
 
-        # Create destination folder if not exists
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(process_image, rel_paths, [manifest.get(p) for p in rel_paths],
+                           [force] * len(rel_paths), chunksize=16)
+        for rel_path, status, entry, error in results:
+            counts[status] += 1
+            if entry:
+                manifest[rel_path] = entry
+            if status == 'created':
+                print(f"✅ Created: {rel_path}")
+            elif status == 'updated':
+                print(f"🔄 Updated: {rel_path}")
+            elif status == 'error':
+                print(f"❌ Error processing {rel_path}: {error}")
 
-        for file in files:
-            if is_image(file):
-                source_file = os.path.join(root, file)
-                dest_file = os.path.join(target_dir, file)
-
-                # Skip if thumbnail already exists (Remove this check if you want to overwrite)
-                if os.path.exists(dest_file):
-                    skipped_count += 1
-                    continue
-
-                try:
-                    with Image.open(source_file) as img:
-                        # Convert to RGB if needed (e.g. for transparent PNGs saving as JPG, 
-                        # though here we save as original format so RGBA is fine for PNG)
-                        
-                        # Create thumbnail (modifies img in place, preserves aspect ratio)
-                        img.thumbnail(MAX_SIZE)
-                        
-                        # Save
-                        img.save(dest_file)
-                        print(f"✅ Created: {relative_path}/{file}")
-                        processed_count += 1
-                except Exception as e:
-                    print(f"❌ Error processing {file}: {e}")
-                    error_count += 1
+    # Forget originals that were deleted (only known for a full run)
+    if not only:
+        existing = set(rel_paths)
+        for rel_path in [p for p in manifest if p not in existing]:
+            del manifest[rel_path]
+    save_manifest(manifest)
 
     print("-" * 30)
-    print(f"Done! Created: {processed_count}, Skipped: {skipped_count}, Errors: {error_count}")
+    print(f"Done! Created: {counts['created']}, Updated: {counts['updated']}, "
+          f"Skipped: {counts['skipped']}, Errors: {counts['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate thumbnails for every image in the collection.")
+    parser.add_argument('--force', action='store_true', help="regenerate every thumbnail, even if up to date")
+    parser.add_argument('--only', metavar='SUBTREE', help=f"only process this folder, relative to '{SOURCE_FOLDER}'")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+    generate(force=args.force, only=args.only, workers=args.workers)
 
 if __name__ == "__main__":
-    generate()
+    main()
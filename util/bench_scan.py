@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+# Run from anywhere: paths in app.py are relative to the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import app
+from app import IMAGE_FOLDER, THUMB_FOLDER, is_image, get_json_data, get_trans_obj
+
+WARM_RUNS = 10
+
+# Compare like for like: the legacy scanner always probes thumbnails on disk
+app.THUMB_ON_DEMAND = False
+
+
+# --- LEGACY SCANNER (listdir + isdir/exists per entry), kept for comparison ---
+def legacy_scan_collection():
+    collection = []
+    for category_name in os.listdir(IMAGE_FOLDER):
+        category_path = os.path.join(IMAGE_FOLDER, category_name)
+        if not os.path.isdir(category_path) or category_name in ['thumbnails', 'static']:
+            continue
+        cat_obj = get_trans_obj(category_name)
+        for series_name in os.listdir(category_path):
+            series_path = os.path.join(category_path, series_name)
+            if not os.path.isdir(series_path): continue
+            series_obj = get_trans_obj(series_name)
+            series_img = None
+            for f in os.listdir(series_path):
+                if is_image(f):
+                    series_img = os.path.join(category_name, series_name, f).replace("\\", "/")
+                    break
+            for year in os.listdir(series_path):
+                year_path = os.path.join(series_path, year)
+                if not os.path.isdir(year_path): continue
+                for coin_name in os.listdir(year_path):
+                    coin_path = os.path.join(year_path, coin_name)
+                    if not os.path.isdir(coin_path): continue
+                    legacy_process_coin_item(collection, category_name, series_name, year, coin_name, coin_path, cat_obj, series_obj, series_img)
+    return collection
+
+
+def legacy_process_coin_item(collection, category_name, series_dir_name, year, coin_name, coin_path, cat_obj, series_obj, series_img):
+    folder_contents = os.listdir(coin_path)
+    subdirs = [d for d in folder_contents if os.path.isdir(os.path.join(coin_path, d))]
+    images_in_root = sorted(f for f in folder_contents if is_image(f))
+    coin_stats = get_json_data(os.path.join(coin_path, 'details.json'))
+    name_obj = get_trans_obj(coin_name)
+
+    def build_img_path(img_file, sub_folder=None):
+        parts = [category_name, series_dir_name, year, coin_name]
+        if sub_folder: parts.append(sub_folder)
+        parts.append(img_file)
+        return os.path.join(*parts).replace("\\", "/")
+
+    if images_in_root:
+        subtype_obj = {'he': "ללא תיוג", 'en': "Untagged"} if subdirs else None
+        img_paths = [build_img_path(img) for img in images_in_root]
+        collection.append({
+            'category': cat_obj, 'series': series_obj, 'series_img': series_img, 'year': year,
+            'name': name_obj, 'subtype': subtype_obj,
+            'images': img_paths, 'thumb_src': img_paths[0],
+            'thumb_available': os.path.exists(os.path.join(THUMB_FOLDER, img_paths[0])),
+            'has_image': True, 'stats': coin_stats
+        })
+    for subtype in subdirs:
+        subtype_path = os.path.join(coin_path, subtype)
+        subtype_imgs = sorted(f for f in os.listdir(subtype_path) if is_image(f))
+        final_stats = {**coin_stats, **get_json_data(os.path.join(subtype_path, 'details.json'))}
+        subtype_obj = get_trans_obj(subtype)
+        if subtype_imgs:
+            img_paths = [build_img_path(img, subtype) for img in subtype_imgs]
+            collection.append({
+                'category': cat_obj, 'series': series_obj, 'series_img': series_img, 'year': year,
+                'name': name_obj, 'subtype': subtype_obj,
+                'images': img_paths, 'thumb_src': img_paths[0],
+                'thumb_available': os.path.exists(os.path.join(THUMB_FOLDER, img_paths[0])),
+                'has_image': True, 'stats': final_stats
+            })
+        else:
+            collection.append({
+                'category': cat_obj, 'series': series_obj, 'series_img': series_img, 'year': year,
+                'name': name_obj, 'subtype': subtype_obj, 'images': [],
+                'has_image': False, 'stats': final_stats
+            })
+    if not images_in_root and not subdirs:
+        collection.append({
+            'category': cat_obj, 'series': series_obj, 'series_img': series_img, 'year': year,
+            'name': name_obj, 'subtype': None, 'images': [],
+            'has_image': False, 'stats': coin_stats
+        })
+
+
+def full_scan():
+    app.reset_scan_state()
+    return app.scan_collection()
+
+
+def drop_caches():
+    """Drop the OS page/dentry caches (Linux, needs root). Returns False if not possible."""
+    try:
+        subprocess.run(['sync'], check=False)
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def bench(label, scan):
+    cold_ok = drop_caches()
+    start = time.perf_counter()
+    result = scan()
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(WARM_RUNS):
+        start = time.perf_counter()
+        scan()
+        warm.append(time.perf_counter() - start)
+
+    cold_label = "cold" if cold_ok else "first run (caches not dropped)"
+    print(f"{label:<12} {cold_label}: {cold * 1000:8.1f} ms | "
+          f"warm median: {statistics.median(warm) * 1000:8.1f} ms, min: {min(warm) * 1000:8.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    print(f"🚀 Benchmarking scan of '{IMAGE_FOLDER}' ({app.SCAN_WORKERS} scan workers)...")
+    legacy = bench("legacy", legacy_scan_collection)
+    current = bench("scandir", full_scan)
+    bench("incremental", app.scan_collection)
+
+    # Layout hints from the thumbnail manifest are new, the rest must match
+    hints = ('thumb_width', 'thumb_height', 'thumb_srcset', 'thumb_url', 'image_urls', 'sprite')
+    current = [{k: v for k, v in coin.items() if k not in hints} for coin in current]
+
+    print("-" * 30)
+    if legacy == current:
+        print(f"✅ Output identical ({len(current)} entries)")
+    else:
+        print("❌ Output differs from the legacy scanner!")
+        sys.exit(1)
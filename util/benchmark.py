@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+import cv2
+import numpy as np
+
+# Run from anywhere: the project is imported from its root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+import thumbnailsGenerater
+
+# Benchmarks the hot paths on synthetic trees with this project's layout
+# (category/series/year/coin[/subtype] with details.json), at multiples of the
+# current collection's size, and writes the timings as JSON so runs can be diffed.
+
+# Shape of the current tree at 1x, per category: series, years per series,
+# coins per year, share of coins split into two subtypes, images per folder
+LAYOUT = {
+    'מחזור': {'series': 5, 'years': 14, 'coins': 5, 'subtypes': 0.3, 'images': 2, 'details': True},
+    'סטים לאספנים': {'series': 3, 'years': 13, 'coins': 1, 'subtypes': 0.35, 'images': 14, 'details': False},
+}
+SCALES = (1, 10, 100)
+IMAGE_SIZE = 64  # synthetic images are tiny: the scan never decodes them
+WARM_RUNS = 5
+SLUG_LOOKUPS = 200
+OUTPUT_FILE = 'benchmark_results.json'
+
+
+# --- SYNTHETIC TREE ---
+def make_image(size, rng):
+    img = cv2.GaussianBlur(rng.integers(0, 255, (size, size, 3), dtype=np.uint8), (0, 0), size / 16)
+    ok, buf = cv2.imencode('.jpg', img)
+    return buf.tobytes()
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+def write_coin(path, images, image_data, details):
+    os.makedirs(path)
+    for n in range(images):
+        with open(os.path.join(path, f"{n + 1:02d}.jpg"), 'wb') as f:
+            f.write(image_data)
+    if details:
+        write_json(os.path.join(path, 'details.json'), details)
+
+def build_tree(root, scale, image_size, seed=0):
+    """Write a synthetic images/ tree `scale` times the size of the current one. Returns its counts."""
+    rnd = random.Random(seed)
+    image_data = make_image(image_size, np.random.default_rng(seed))
+    images_root = os.path.join(root, app.IMAGE_FOLDER)
+    counts = {'coin_folders': 0, 'images': 0}
+
+    for category, shape in LAYOUT.items():
+        for s in range(shape['series'] * scale):
+            series_path = os.path.join(images_root, category, f"סדרה {s + 1}")
+            os.makedirs(series_path)
+            with open(os.path.join(series_path, 'series.jpg'), 'wb') as f:
+                f.write(image_data)
+            for y in range(shape['years']):
+                year_path = os.path.join(series_path, f"שנה {y + 1} ({1948 + (s + y) % 77})")
+                for c in range(shape['coins']):
+                    coin_path = os.path.join(year_path, f"מטבע {c + 1}")
+                    details = {'משקל': f"{rnd.randint(1, 30)} גרם", 'קוטר': f"{rnd.randint(15, 40)} מ\"מ",
+                               'חומר': rnd.choice(['נחושת', 'ניקל', 'אלומיניום'])} if shape['details'] else None
+                    write_coin(coin_path, shape['images'], image_data, details)
+                    counts['coin_folders'] += 1
+                    counts['images'] += shape['images']
+                    if rnd.random() < shape['subtypes']:
+                        for t in range(2):
+                            write_coin(os.path.join(coin_path, f"סוג {t + 1}"), shape['images'], image_data, None)
+                            counts['images'] += shape['images']
+
+    shutil.copy(os.path.join(ROOT, app.FOLDER_MAP_FILE), os.path.join(root, app.FOLDER_MAP_FILE))
+    shutil.copy(os.path.join(ROOT, app.IMAGE_FOLDER, 'order.json'), os.path.join(images_root, 'order.json'))
+    return counts
+
+
+# --- TIMERS ---
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def warm_median(fn, runs=WARM_RUNS):
+    return statistics.median(timed(fn)[0] for _ in range(runs))
+
+def reset_app():
+    """Forget everything the app cached about the previous tree"""
+    app.reset_scan_state()
+    app._catalog = None
+    app.load_folder_map()
+
+def bench_scale(scale, image_size, workdir, thumbnails=True):
+    root = os.path.join(workdir, f"x{scale}")
+    print(f"\n🌳 Building {scale}x tree in {root}...")
+    seconds, counts = timed(lambda: build_tree(root, scale, image_size))
+    print(f"   {counts['coin_folders']} coin folders, {counts['images']} images ({seconds:.1f} s)")
+
+    # app.py and the thumbnail generator use paths relative to the project root
+    os.chdir(root)
+    reset_app()
+    # Files written within the racy window are never trusted by the incremental scan
+    time.sleep(app.RACY_WINDOW_NS / 1e9)
+    result = {'scale': scale, **counts}
+
+    # 1. SCAN
+    result['scan_full_s'], coins = timed(lambda: (app.reset_scan_state(), app.scan_collection())[1])
+    result['scan_incremental_s'] = warm_median(app.scan_collection)
+    result['catalog_entries'] = len(coins)
+    print(f"   scan: full {result['scan_full_s'] * 1000:.0f} ms, "
+          f"incremental {result['scan_incremental_s'] * 1000:.1f} ms ({len(coins)} entries)")
+
+    # 2. /api/data SERIALIZATION (json + gzip + brotli), then a cached request
+    catalog = app.get_catalog()
+    result['api_data_build_s'], payload = timed(lambda: app.build_payload(app.data_response(catalog)))
+    result['api_data_bytes'] = len(payload['encodings']['identity'])
+    result['api_data_gzip_bytes'] = len(payload['encodings']['gzip'])
+    result['api_data_compact_build_s'], payload = timed(lambda: app.build_payload(app.compact_response(catalog)))
+    result['api_data_compact_bytes'] = len(payload['encodings']['identity'])
+    result['api_data_compact_gzip_bytes'] = len(payload['encodings']['gzip'])
+    client = app.app.test_client()
+    client.get('/api/data')
+    result['api_data_request_s'] = warm_median(lambda: client.get('/api/data', headers={'Accept-Encoding': 'br, gzip'}))
+    print(f"   /api/data: build {result['api_data_build_s'] * 1000:.0f} ms "
+          f"({result['api_data_bytes']} bytes), cached request {result['api_data_request_s'] * 1000:.2f} ms")
+    print(f"   /api/data?format=compact: build {result['api_data_compact_build_s'] * 1000:.0f} ms "
+          f"({result['api_data_compact_bytes']} bytes, gzip {result['api_data_compact_gzip_bytes']})")
+
+    # 3. SHARE LINKS: index() resolving ?coin=<slug>
+    slugs = list(catalog['slugs'])
+    picks = random.Random(1).choices(slugs, k=SLUG_LOOKUPS)
+    times = [timed(lambda: client.get('/', query_string={'coin': slug}))[0] for slug in picks]
+    result['index_slug_median_s'] = statistics.median(times)
+    result['index_slug_p95_s'] = sorted(times)[int(len(times) * 0.95) - 1]
+    result['index_missing_slug_s'] = warm_median(lambda: client.get('/', query_string={'coin': 'no-such-coin'}))
+    print(f"   index(?coin=): median {result['index_slug_median_s'] * 1000:.2f} ms, "
+          f"p95 {result['index_slug_p95_s'] * 1000:.2f} ms")
+
+    # 4. THUMBNAILS: full generation, then a run where everything is up to date
+    if thumbnails:
+        result['thumbs_full_s'], _ = timed(lambda: quiet(thumbnailsGenerater.generate))
+        result['thumbs_noop_s'], _ = timed(lambda: quiet(thumbnailsGenerater.generate))
+        print(f"   thumbnails: full {result['thumbs_full_s']:.1f} s, up to date {result['thumbs_noop_s']:.2f} s")
+
+    os.chdir(ROOT)
+    shutil.rmtree(root)
+    return result
+
+def quiet(fn):
+    """Run fn with its per-file progress output silenced"""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            return fn()
+        finally:
+            sys.stdout = stdout
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scan, /api/data, share links and thumbnails on synthetic trees.")
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)),
+                        help=f"comma-separated multiples of the current tree (default: {','.join(map(str, SCALES))})")
+    parser.add_argument('--image-size', type=int, default=IMAGE_SIZE, help=f"synthetic image side in px (default: {IMAGE_SIZE})")
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f"JSON results file (default: {OUTPUT_FILE})")
+    parser.add_argument('--workdir', default=None, help="where to build the trees (default: a temp dir)")
+    parser.add_argument('--no-thumbnails', action='store_true', help="skip thumbnail generation (the slowest part at 100x)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    # Like-for-like runs: no on-demand rendering, thumbnails come from the generator
+    app.THUMB_ON_DEMAND = False
+    workdir = tempfile.mkdtemp(prefix='coins-bench-', dir=args.workdir)
+    print(f"🚀 Benchmarking scales {args.scales} in {workdir}...")
+    try:
+        results = [bench_scale(int(scale), args.image_size, workdir, not args.no_thumbnails) for scale in args.scales.split(',')]
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'image_size': args.image_size,
+            'results': results,
+        }, f, indent=2)
+    print("-" * 30)
+    print(f"✅ Wrote {output}")
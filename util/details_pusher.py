@@ -1,245 +1,116 @@
 import os
+import sys
 import json
-def noop_add_json_data(data: dict, folder1_name: str, folder2_name_part: list, folder3_name_part: str):
-    pass
-    
-def add_json_data(data: dict, folder1_name: str, folder2_name_part: list, folder3_name_part: str):
-    """
-    Finds all subfolders in folder1_name whose names contain any element of folder2_name_part.
-    Inside each of those, finds a folder named folder3_name_part.
-    In each such folder, updates (or creates) a details.json file by merging the given data.
+import difflib
+import argparse
+
+# Run from anywhere: rule folders are relative to the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+RULES_FILE = os.path.join('util', 'details_rules.json')
+
+# A rule merges 'data' into <folder>/<year>/<coin>/details.json for every year
+# folder whose name contains a year of 'year_range' (inclusive), e.g.
+#   {"folder": "images/מחזור/לירה", "year_range": [1960, 1980], "coin": "אגורה",
+#    "data": {"משקל": "1.3 גרם"}}
+# Rules apply in file order, so a later rule overrides an earlier one's values.
+
+def load_rules(path=RULES_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def rule_years(rule):
+    first, last = rule['year_range']
+    return [str(year) for year in range(first, last + 1)]
+
+def read_details(json_path):
+    """Existing details.json as a dict, plus its raw text for diffs ('' if missing)"""
+    if not os.path.exists(json_path):
+        return {}, ''
+    with open(json_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        existing = json.loads(text)
+    except json.JSONDecodeError:
+        existing = {}
+    if not isinstance(existing, dict):
+        existing = {}  # Force to dict if wrong type
+    return existing, text
+
+def plan_updates(rules):
+    """Walk every rule folder once, matching all of its rules per year folder.
+
+    Returns {details.json path: merged data of every matching rule, in rule order}.
     """
-    count = 0
-    for f2 in os.listdir(folder1_name):
-        full_f2_path = os.path.join(folder1_name, f2)
-        if not os.path.isdir(full_f2_path):
+    by_folder = {}
+    for rule in rules:
+        by_folder.setdefault(rule['folder'], []).append((rule, rule_years(rule)))
+
+    updates = {}
+    for folder, folder_rules in by_folder.items():
+        if not os.path.isdir(folder):
+            print(f"⚠️ Skipping missing folder {folder}")
             continue
-
-        # Folder2 name must contain ANY of the given substrings
-        if not any(part in f2 for part in folder2_name_part):
+        for year in sorted(os.listdir(folder)):
+            year_path = os.path.join(folder, year)
+            if not os.path.isdir(year_path):
+                continue
+            for rule, years in folder_rules:
+                # Year folder name must contain ANY of the rule's years
+                if not any(part in year for part in years):
+                    continue
+                coin_path = os.path.join(year_path, rule['coin'])
+                if os.path.isdir(coin_path):
+                    updates.setdefault(os.path.join(coin_path, 'details.json'), {}).update(rule['data'])
+    return updates
+
+def write_atomic(json_path, text):
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, json_path)
+
+def apply_updates(updates, dry_run=False):
+    """Merge each file's updates and write it once. Unchanged files are left alone."""
+    changed = 0
+    for json_path, data in sorted(updates.items()):
+        existing, old_text = read_details(json_path)
+        merged = {**existing, **data}
+        if old_text and merged == existing:
             continue
 
-        # Verify folder3 exists
-        f3_path = os.path.join(full_f2_path, folder3_name_part)
-        if not os.path.isdir(f3_path):
-            continue
-
-        # Path to details.json
-        json_path = os.path.join(f3_path, "details.json")
-
-        # Load existing JSON object if present
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    existing = json.load(f)
-                if not isinstance(existing, dict):
-                    existing = {}  # Force to dict if wrong type
-            except json.JSONDecodeError:
-                existing = {}
+        new_text = json.dumps(merged, indent=4, ensure_ascii=False)
+        if dry_run:
+            sys.stdout.writelines(difflib.unified_diff(
+                old_text.splitlines(keepends=True), (new_text + '\n').splitlines(keepends=True),
+                fromfile=json_path, tofile=json_path))
         else:
-            existing = {}
-
-        # Merge new data (new values override old ones)
-        existing.update(data)
-
-        # Save result
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(existing, f, indent=4, ensure_ascii=False)
-        count += 1
-    print("updated",count,"files")
- 
-
-
-
-noop_add_json_data(	
-    data={"משקל": "1.3 גרם","קוטר": "21 מ\"מ","חומר":  "סגסוגת של 97% אלומיניום, 3% מגנזיום"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1981)],
-    folder3_name_part="אגורה"
-)   
-noop_add_json_data(	
-    data={"משקל": "2.3 גרם","קוטר": "17.5 מ\"מ","חומר":  "סגסוגת של 92% נחושת, 6% אלומיניום, 2% ניקל"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1976)],
-    folder3_name_part="5 אגורות"
-)   
-
-noop_add_json_data(	
-    data={"משקל": "0.75 גרם","קוטר": "17.5 מ\"מ","חומר":  "סגסוגת של 97% אלומיניום, 3% מגנזיום"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1976,1981)],
-    folder3_name_part="5 אגורות"
-)   
-noop_add_json_data(	
-    data={"משקל": "5 גרם","קוטר": "21.5 מ\"מ","חומר":  "סגסוגת של 92% נחושת, 6% אלומיניום, 2% ניקל"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1977)],
-    folder3_name_part="10 אגורות"
-)   
-noop_add_json_data(	
-    data={"משקל": "1.6 גרם","קוטר": "21.5 מ\"מ","חומר":  "סגסוגת של 97% אלומיניום, 3% מגנזיום"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1978,1981)],
-    folder3_name_part="10 אגורות"
-)   
-
-noop_add_json_data(	
-    data={"משקל": "6.5 גרם","קוטר": "25.5 מ\"מ","חומר":  "סגסוגת של 92% נחושת, 6% אלומיניום, 2% ניקל"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1981)],
-    folder3_name_part="25 אגורות"
-)   
-noop_add_json_data(	
-    data={"משקל": "6.8 גרם","קוטר": "24.5 מ\"מ","חומר":  "סגסוגת של 75% נחושת ו-25% ניקל"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1981)],
-    folder3_name_part="חצי לירה"
-)  
-
-noop_add_json_data(	
-    data={"משקל": "9 גרם","קוטר": "27.5 מ\"מ","חומר":  "סגסוגת של 75% נחושת ו-25% ניקל"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1981)],
-    folder3_name_part="לירה"
-)  
-
-
-noop_add_json_data(	
-    data={"משקל": "11.2 גרם","קוטר": "30 מ\"מ","חומר":  "סגסוגת של 75% נחושת ו-25% ניקל"},
-    folder1_name="images/לירה",
-    folder2_name_part=[str(i) for i in range(1960,1981)],
-    folder3_name_part="5 לירות"
-)  
-
-
-noop_add_json_data(	
-    data={"משקל": "0.6 גרם","קוטר": "15 מ\"מ","חומר": "סגסוגת של 97% אלומיניום, 3% מגנזיום"},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="אגורה חדשה"
-)  
+            write_atomic(json_path, new_text)
+        changed += 1
+    return changed
 
-noop_add_json_data(	
-    data={"משקל": "0.9 גרם","קוטר": "18.5 מ\"מ", "חומר": "סגסוגת של 97% אלומיניום, 3% מגנזיום"},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="5 אגורות חדשות"
-)  
-
-
-noop_add_json_data(	
-    data={"משקל": "2.1 גרם","קוטר": "16 מ\"מ", "חומר": "סגסוגת של 92% נחושת, 8% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="10 אגורות חדשות"
-)  
-
-noop_add_json_data(	
-    data={"משקל": "3 גרם","קוטר": "20 מ\"מ", "חומר": "סגסוגת של 75% נחושת ו-25% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="חצי שקל"
-)  
-
-noop_add_json_data(	
-    data={"משקל": "5 גרם","קוטר": "23 מ\"מ", "חומר": "סגסוגת של 75% נחושת ו-25% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="שקל"
-)  
-noop_add_json_data(	
-    data={"משקל": "6.1 גרם","קוטר": "24 מ\"מ", "חומר": "סגסוגת של 92% נחושת, 6% אלומיניום, 2% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="5 שקלים"
-)  
-    
-noop_add_json_data(	
-    data={"משקל": "8 גרם","קוטר": "26 מ\"מ", "חומר": "סגסוגת של 75% נחושת ו-25% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="10 שקלים"
-)  
-
-noop_add_json_data(	
-    data={"משקל": "9 גרם","קוטר": "28 מ\"מ", "חומר": "סגסוגת של 92% נחושת, 6% אלומיניום, 2% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="50 שקלים"
-)  
-
-noop_add_json_data(	
-    data={"משקל": "10.8 גרם","קוטר": "29 מ\"מ", "חומר": "סגסוגת של 75% נחושת ו-25% ניקל."},
-    folder1_name="images/שקל",
-    folder2_name_part=[str(i) for i in range(1980,1986)],
-    folder3_name_part="100 שקלים"
-)  
-
-
-noop_add_json_data(	
-    data={"משקל": "3.5 גרם","קוטר": "18 מ\"מ", "חומר": "פלדה מצופה ניקל."},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1994,2025)],
-    folder3_name_part="שקל"
-)  
-
-
-
-noop_add_json_data(	
-    data={"משקל": "4 גרם","קוטר": "18 מ\"מ", "חומר": "סגסוגת של 75% נחושת ו-25% ניקל."},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,1994)],
-    folder3_name_part="שקל"
-)  
-
-
-noop_add_json_data(	
-    data={"משקל": "3.5 גרם","קוטר": "18 מ\"מ", "חומר": "פלדה מצופה ניקל."},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1994,2025)],
-    folder3_name_part="שקל"
-)  
-
-
-noop_add_json_data(	
-    data={"משקל": "5.7 גרם","קוטר": "21.6 מ\"מ", "חומר": "פלדה מצופה ניקל."},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="2 שקלים"
-)  
-noop_add_json_data(	
-    data={"משקל": "7 גרם","קוטר": "23 מ\"מ", "חומר": "טבעתו החיצונית עשויה מפלדה מצופה בניקל. מרכזו עשוי ארד מצופה באורייט"},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="10 שקלים"
-)  
-noop_add_json_data(	
-    data={"משקל": "8.18 גרם","קוטר": "24 מ\"מ", "חומר": "סגסוגת שתרכובתה 75% נחושת ו-25% ניקל"},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="5 שקלים"
-)
-noop_add_json_data(
-    data={"משקל": "3 גרם","קוטר": "19.5 מ\"מ", "חומר": "סגסוגת שתרכובתה 92% נחושת, 6% אלומיניום ו-2% ניקל"},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="5 אגורות"
-)
-noop_add_json_data(
-    data={"משקל": "2 גרם","קוטר": "17 מ\"מ", "חומר": "סגסוגת שתרכובתה 92% נחושת, 6% אלומיניום ו-2% ניקל"},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="אגורה"
-)
-noop_add_json_data(
-    data={"משקל": "6.5 גרם","קוטר": "26 מ\"מ", "חומר": "סגסוגת שתרכובתה 92% נחושת, 6% אלומיניום ו-2% ניקל"},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="חצי שקל"
-)
-noop_add_json_data(
-    data={"משקל": "4 גרם","קוטר": "22 מ\"מ", "חומר": "סגסוגת שתרכובתה 92% נחושת, 6% אלומיניום ו-2% ניקל"},
-    folder1_name="images/שקל חדש",
-    folder2_name_part=[str(i) for i in range(1980,2025)],
-    folder3_name_part="10 אגורות"
-)
+def add_json_data(data: dict, folder1_name: str, folder2_name_part: list, folder3_name_part: str):
+    """
+    Finds all subfolders in folder1_name whose names contain any element of folder2_name_part.
+    Inside each of those, finds a folder named folder3_name_part.
+    In each such folder, updates (or creates) a details.json file by merging the given data.
+    """
+    updates = {}
+    for f2 in sorted(os.listdir(folder1_name)):
+        f3_path = os.path.join(folder1_name, f2, folder3_name_part)
+        if any(part in f2 for part in folder2_name_part) and os.path.isdir(f3_path):
+            updates[os.path.join(f3_path, "details.json")] = dict(data)
+    print("updated", apply_updates(updates), "files")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply every details.json rule in one pass over the tree.")
+    parser.add_argument('--rules', default=RULES_FILE, help=f"rules file (default: {RULES_FILE})")
+    parser.add_argument('--dry-run', action='store_true', help="print a diff of every change instead of writing")
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    updates = plan_updates(rules)
+    changed = apply_updates(updates, dry_run=args.dry_run)
+    verb = "would update" if args.dry_run else "updated"
+    print(f"✅ {len(rules)} rules matched {len(updates)} files, {verb} {changed}")
@@ -1,55 +1,11 @@
 import os
-from PIL import Image, ImageOps
+import sys
 
+# The generator lives in the project root (next to app.py); this entry point
+# is kept so `python util/thumbnailsGenerater.py` keeps working.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Configuration
-SOURCE_FOLDER = 'images'
-DEST_FOLDER = 'thumbnails'
-MAX_SIZE = (400, 400)  # Max width/height in pixels
-ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
-
-def is_image(filename):
-    return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
-
-def generate():
-    print(f"🚀 Starting thumbnail generation from '{SOURCE_FOLDER}' to '{DEST_FOLDER}'...")
-    
-    processed_count = 0
-    skipped_count = 0
-    error_count = 0
-
-    for root, dirs, files in os.walk(SOURCE_FOLDER):
-        # Determine destination path mirroring the source
-        relative_path = os.path.relpath(root, SOURCE_FOLDER)
-        target_dir = os.path.join(DEST_FOLDER, relative_path)
-
-        # Create destination folder if not exists
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
-
-        for file in files:
-            if is_image(file):
-                source_file = os.path.join(root, file)
-                dest_file = os.path.join(target_dir, file)
-
-                # Skip if thumbnail already exists (Remove this check if you want to overwrite)
-                if os.path.exists(dest_file):
-                    skipped_count += 1
-                    continue
-
-                try:
-                    with Image.open(source_file) as img:
-                        img = ImageOps.exif_transpose(img)
-                        img.thumbnail(MAX_SIZE)
-                        img.save(dest_file)
-                        print(f"✅ Created: {relative_path}/{file}")
-                        processed_count += 1
-                except Exception as e:
-                    print(f"❌ Error processing {file}: {e}")
-                    error_count += 1
-
-    print("-" * 30)
-    print(f"Done! Created: {processed_count}, Skipped: {skipped_count}, Errors: {error_count}")
+from thumbnailsGenerater import main
 
 if __name__ == "__main__":
-    generate()
+    main()
@@ -1,9 +1,13 @@
 import os
 import json
+import argparse
 
 # --- CONFIGURATION ---
 IMAGE_FOLDER = 'images'
 FOLDER_MAP_FILE = 'folder_map.json'
+# Batch mode: untranslated terms are exported here, translated offline, then imported
+WORKLIST_FILE = 'translation_worklist.json'
+MAX_CONTEXTS = 5
 
 # EXACT Hebrew strings used in index.html
 UI_TERMS = [
@@ -51,60 +55,109 @@ def ask_translation(text, context=""):
     if not english:
         english = text
 
+    # Saved once by scan_all(), not after every answer
     folder_map[text] = english
-    save_json(FOLDER_MAP_FILE, folder_map)
 
-def scan_details(d_path,coin):
-  if os.path.exists(d_path):
+def details_terms(d_path, coin):
+    """(text, context) of every key and value in a details.json"""
+    if os.path.exists(d_path):
         data = load_json(d_path)
-        #print(d_path)
         for k, v in data.items():
-            ask_translation(k, f"Key in {coin}")
+            yield k, f"Key in {coin}"
             if isinstance(v, str):
-                ask_translation(v, f"Value in {coin}")
+                yield v, f"Value in {coin}"
             elif isinstance(v, dict) and 'he' in v:
-                ask_translation(v['he'], f"Value in {coin}")
-                
-def scan_all():
-    print("🚀 Starting Complete Scan...")
-    
-    # 1. SCAN UI TERMS (Fixes your headlines/buttons)
-    print("\n--- Checking Interface Terms ---")
+                yield v['he'], f"Value in {coin}"
+
+def find_terms():
+    """(text, context) of every translatable term, in walk order (with repeats)"""
+    # 1. UI TERMS (headlines/buttons)
     for term in UI_TERMS:
-        ask_translation(term, "Website Interface")
-
-    # 2. SCAN FOLDERS
-    print("\n--- Checking Folders ---")
-    if os.path.exists(IMAGE_FOLDER):
-        for collectionType in os.listdir(IMAGE_FOLDER):
-          if collectionType.endswith(".json"):
-            continue
-          collection_type_path = os.path.join(IMAGE_FOLDER, collectionType)
-          for series in os.listdir(collection_type_path):
+        yield term, "Website Interface"
+
+    # 2. FOLDERS
+    if not os.path.exists(IMAGE_FOLDER):
+        return
+    for collectionType in sorted(os.listdir(IMAGE_FOLDER)):
+        collection_type_path = os.path.join(IMAGE_FOLDER, collectionType)
+        if not os.path.isdir(collection_type_path): continue
+        for series in sorted(os.listdir(collection_type_path)):
             path = os.path.join(collection_type_path, series)
             if not os.path.isdir(path): continue
-            ask_translation(series, "Series Name")
-            
-            for year in os.listdir(path):
+            yield series, "Series Name"
+
+            for year in sorted(os.listdir(path)):
                 y_path = os.path.join(path, year)
                 if not os.path.isdir(y_path): continue
-                print(y_path)
-                for coin in os.listdir(y_path):
+                for coin in sorted(os.listdir(y_path)):
                     c_path = os.path.join(y_path, coin)
                     if not os.path.isdir(c_path): continue
-                    
-                    ask_translation(coin, "Coin Name")
-                    
-                    # 3. SCAN DETAILS.JSON
-                    d_path = os.path.join(c_path, 'details.json')
-                    scan_details(d_path,coin)
+                    where = f"{series}/{year}/{coin}"
+
+                    yield coin, f"Coin Name ({series}/{year})"
+
+                    # 3. DETAILS.JSON
+                    yield from details_terms(os.path.join(c_path, 'details.json'), where)
 
                     # Subtypes
-                    for sub in os.listdir(c_path):
+                    for sub in sorted(os.listdir(c_path)):
                         if os.path.isdir(os.path.join(c_path, sub)):
-                            ask_translation(sub, "Subtype")
-                            scan_details(os.path.join(os.path.join(c_path, sub), 'details.json'),coin)
+                            yield sub, f"Subtype of {where}"
+                            yield from details_terms(os.path.join(c_path, sub, 'details.json'), f"{where}/{sub}")
+
+def pending_terms():
+    """Untranslated terms, deduplicated in first-seen order, with the contexts they appear in"""
+    pending = {}
+    # Older entries can have the folder name's stray spaces in their key
+    translated = {key.strip() for key in folder_map}
+    for text, context in find_terms():
+        if not isinstance(text, str): continue
+        text = text.strip()
+        if not text or text in translated: continue
+        contexts = pending.setdefault(text, [])
+        if context not in contexts and len(contexts) < MAX_CONTEXTS:
+            contexts.append(context)
+    return pending
+
+def scan_all():
+    print("🚀 Starting Complete Scan...")
+    try:
+        for text, context in find_terms():
+            ask_translation(text, context)
+    finally:
+        # One write for the whole session (also on Ctrl+C)
+        save_json(FOLDER_MAP_FILE, folder_map)
     print("\n✨ Done! Refresh your website now.")
 
+def export_worklist(path=WORKLIST_FILE):
+    pending = pending_terms()
+    save_json(path, [{'he': text, 'en': '', 'contexts': contexts} for text, contexts in pending.items()])
+    print(f"📝 Wrote {len(pending)} untranslated terms to {path}. Fill in 'en' and run --import.")
+
+def import_worklist(path=WORKLIST_FILE):
+    items = load_json(path) or []
+    done = {}
+    for item in items:
+        # An entry left as null (or edited into a non-string) counts as still empty
+        he, en = item.get('he'), item.get('en')
+        if isinstance(he, str) and isinstance(en, str) and he.strip() and en.strip():
+            done[he.strip()] = en.strip()
+    folder_map.update(done)
+    save_json(FOLDER_MAP_FILE, folder_map)
+    print(f"✅ Imported {len(done)} translations into {FOLDER_MAP_FILE}, {len(items) - len(done)} still empty.")
+
 if __name__ == "__main__":
-    scan_all()
+    parser = argparse.ArgumentParser(description="Translate folder names and details.json terms into folder_map.json.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--export', nargs='?', const=WORKLIST_FILE, metavar='FILE',
+                       help=f"write every untranslated term to a worklist (default: {WORKLIST_FILE})")
+    group.add_argument('--import', dest='import_file', nargs='?', const=WORKLIST_FILE, metavar='FILE',
+                       help="add the filled-in translations of a worklist to folder_map.json")
+    args = parser.parse_args()
+
+    if args.export:
+        export_worklist(args.export)
+    elif args.import_file:
+        import_worklist(args.import_file)
+    else:
+        scan_all()